@@ -1,19 +1,26 @@
 from flask import Flask
-from supabase import create_client
-from openai import OpenAI
-import os
-from config import SUPABASE_URL, SUPABASE_KEY, DEEPSEEK_API_KEY, DEEPSEEK_API_URL
+from config import CONTENT_INDEX_PRELOAD, SERVICES_PRELOAD
+from app.services import services as default_services
+from app import metrics
 
-# Initialize Supabase globally
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def create_app(services=None, preload=True):
+    """Flask App Factory
 
-# Initialize OpenAI client
-client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_API_URL)
-
-def create_app():
-    """Flask App Factory"""
+    preload=False skips the background warm-ups (content index, clients), e.g. in a
+    server master process that forks workers which start their own (see gunicorn.conf.py).
+    """
     app = Flask(__name__)
 
+    # Shared Supabase/LLM clients (a different registry can be passed in, e.g. with fakes for tests)
+    app.extensions["services"] = services or default_services
+
+    # Warn about auth settings that silently fall back to remote verification
+    from middlewares.auth import check_auth_config
+    check_auth_config()
+
+    # Per-route latency histograms with auth/Supabase/LLM breakdown, served at /metrics
+    metrics.init_app(app)
+
     # Import blueprints inside the function to avoid circular imports
     from app.admin.routes import admin
     from app.users.routes import users
@@ -32,5 +39,17 @@ def create_app():
         app.register_blueprint(chatbot)
     if "main" not in app.blueprints:
         app.register_blueprint(main)
-        
+
+    # Build the in-memory content, search and chat retrieval indexes in the background
+    # (inside an app context, so the builds use this app's registry). The blueprints
+    # above have imported, and so registered, every index content_loader fills.
+    if preload and CONTENT_INDEX_PRELOAD:
+        from app.content_index import content_loader
+        with app.app_context():
+            content_loader.warm()
+
+    # Import the client SDKs and create the clients off the request path
+    if preload and SERVICES_PRELOAD:
+        app.extensions["services"].warm()
+
     return app
@@ -1,9 +1,89 @@
 from flask import Blueprint, request, jsonify
-from middlewares.auth import token_required, is_admin
-from app import supabase  
+import json
+from middlewares.auth import token_required, is_admin, invalidate_user_role
+from app.services import get_supabase
+from app.models import Article, PracticeQuestion, validate_row
+from app.signals import content_changed
+from config import BULK_CHUNK_SIZE
 
 admin = Blueprint('admin', __name__)
 
+MAX_REPORTED_ERRORS = 1000
+
+def iter_bulk_rows():
+    """Yield (row number, row, parse error) from a JSON array or a streamed NDJSON body"""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        # Parse line by line so large uploads are never held in memory at once
+        for number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line), None
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+        return
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Body must be a JSON array or NDJSON (application/x-ndjson)")
+    for number, row in enumerate(data, start=1):
+        yield number, row, None
+
+def bulk_upsert(model):
+    """Validate rows against `model` and upsert them in chunks, reporting errors per row"""
+    from postgrest.exceptions import APIError
+
+    report = {"processed": 0, "written": 0, "failed": 0, "errors": []}
+
+    def fail(number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "errors": errors})
+
+    def upsert(rows):
+        # Missing columns take their database defaults (e.g. generated ids)
+        return get_supabase().table(model.table_name).upsert(rows, on_conflict="id", default_to_null=False).execute().data
+
+    def flush(chunk):
+        written = []
+        try:
+            written = upsert([row for _, row in chunk])
+            report["written"] += len(chunk)
+        except APIError:
+            # PostgREST rejected the whole statement, so nothing was written:
+            # retry row by row to find the rows the database rejects
+            for number, row in chunk:
+                try:
+                    written.extend(upsert(row))
+                    report["written"] += 1
+                except Exception as e:
+                    fail(number, [str(e)])
+        except Exception as e:
+            # The chunk may or may not have been written (e.g. a timeout after commit), and
+            # retrying could insert rows without an id twice, so report every row instead
+            for number, _ in chunk:
+                fail(number, [f"Not confirmed, it may have been written: {e}"])
+
+        # Patch the in-memory indexes per chunk, so written rows are never kept for the whole upload
+        if written:
+            content_changed.send(model.table_name, ids=[row["id"] for row in written], rows=written)
+
+    chunk = []
+    for number, row, parse_error in iter_bulk_rows():
+        report["processed"] += 1
+        errors = [parse_error] if parse_error else validate_row(model, row)
+        if errors:
+            fail(number, errors)
+            continue
+        chunk.append((number, row))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return report
+
 ### --- Articles Management (Admin Only) ---
 @admin.route('/articles', methods=['POST'])
 @token_required
@@ -17,7 +97,8 @@ def create_article(user):
     if not data or "title" not in data or "content" not in data:
         return jsonify({"error": "Missing required fields"}), 400
 
-    response = supabase.table("articles").insert(data).execute()
+    response = get_supabase().table("articles").insert(data).execute()
+    content_changed.send("articles", ids=[row["id"] for row in response.data], rows=response.data)
     return jsonify({"message": "Article added successfully!", "data": response.data})
 
 @admin.route('/articles/<string:article_id>', methods=['PUT'])
@@ -31,7 +112,8 @@ def update_article(user, article_id):
     if not data:
         return jsonify({"error": "No update data provided"}), 400
 
-    response = supabase.table("articles").update(data).eq("id", article_id).execute()
+    response = get_supabase().table("articles").update(data).eq("id", article_id).execute()
+    content_changed.send("articles", ids=[article_id], rows=response.data)
     return jsonify({"message": "Article updated successfully!", "data": response.data})
 
 @admin.route('/articles/<string:article_id>', methods=['DELETE'])
@@ -41,9 +123,23 @@ def delete_article(user, article_id):
     if not is_admin(user):
         return jsonify({"error": "Unauthorized: Admin access required"}), 403
 
-    response = supabase.table("articles").delete().eq("id", article_id).execute()
+    response = get_supabase().table("articles").delete().eq("id", article_id).execute()
+    content_changed.send("articles", ids=[article_id], rows=[])
     return jsonify({"message": "Article deleted successfully!"})
 
+@admin.route('/articles/bulk', methods=['POST'])
+@token_required
+def bulk_upsert_articles(user):
+    """Only Admin can import articles in bulk (rows with an existing id replace it)"""
+    if not is_admin(user):
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    try:
+        report = bulk_upsert(Article)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Bulk article import finished", **report})
+
 ### --- Practice Questions Management (Admin Only) ---
 @admin.route('/questions', methods=['POST'])
 @token_required
@@ -57,7 +153,8 @@ def create_question(user):
     if not data or "title" not in data or "link" not in data or "difficulty" not in data:
         return jsonify({"error": "Missing required fields"}), 400
 
-    response = supabase.table("practicequestions").insert(data).execute()
+    response = get_supabase().table("practicequestions").insert(data).execute()
+    content_changed.send("practicequestions", ids=[row["id"] for row in response.data], rows=response.data)
     return jsonify({"message": "Question added successfully!", "data": response.data})
 
 @admin.route('/questions/<int:question_id>', methods=['PUT'])
@@ -71,7 +168,8 @@ def update_question(user, question_id):
     if not data:
         return jsonify({"error": "No update data provided"}), 400
 
-    response = supabase.table("practicequestions").update(data).eq("id", question_id).execute()
+    response = get_supabase().table("practicequestions").update(data).eq("id", question_id).execute()
+    content_changed.send("practicequestions", ids=[question_id], rows=response.data)
     return jsonify({"message": "Question updated successfully!", "data": response.data})
 
 @admin.route('/questions/<int:question_id>', methods=['DELETE'])
@@ -81,5 +179,38 @@ def delete_question(user, question_id):
     if not is_admin(user):
         return jsonify({"error": "Unauthorized: Admin access required"}), 403
 
-    response = supabase.table("practicequestions").delete().eq("id", question_id).execute()
+    response = get_supabase().table("practicequestions").delete().eq("id", question_id).execute()
+    content_changed.send("practicequestions", ids=[question_id], rows=[])
     return jsonify({"message": "Question deleted successfully!"})
+
+@admin.route('/questions/bulk', methods=['POST'])
+@token_required
+def bulk_upsert_questions(user):
+    """Only Admin can import questions in bulk (rows with an existing id replace it)"""
+    if not is_admin(user):
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    try:
+        report = bulk_upsert(PracticeQuestion)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": "Bulk question import finished", **report})
+
+### --- User Roles Management (Admin Only) ---
+@admin.route('/users/<string:user_id>/role', methods=['PUT'])
+@token_required
+def update_user_role(user, user_id):
+    """Only Admin can change a user's role"""
+    if not is_admin(user):
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    data = request.get_json()
+    if not data or data.get("role") not in ("user", "admin"):
+        return jsonify({"error": "Role must be 'user' or 'admin'"}), 400
+
+    response = get_supabase().table("users").update({"role": data["role"]}).eq("id", user_id).execute()
+
+    # Drop the cached role so a promotion applies to the user's next request (admin roles
+    # are never cached, so a demotion applies on every worker immediately)
+    invalidate_user_role(user_id)
+    return jsonify({"message": "User role updated successfully!", "data": response.data})
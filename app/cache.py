@@ -0,0 +1,105 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after being set"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store `value` under `key`, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove `key` from the cache and return its value"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[0] if item else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Snapshot of size and hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ReadCache:
+    """Read-through cache for JSON payloads, invalidated per namespace (e.g. a table name).
+
+    Each namespace has a version that is bumped on invalidation and is part of
+    every key, so stale entries are never served and simply age out of the LRU.
+    """
+
+    def __init__(self, maxsize=1000, ttl=300):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def get_or_load(self, namespaces, key, loader):
+        """Return (data, etag), calling `loader` on a miss; `loader` returning None is not cached"""
+        versioned_key = (tuple((n, self._versions.get(n, 0)) for n in namespaces), key)
+        entry = self._entries.get(versioned_key)
+        if entry is None:
+            data = loader()
+            if data is None:
+                return None
+            body = json.dumps(data, sort_keys=True, default=str)
+            etag = hashlib.sha1(body.encode()).hexdigest()
+            entry = (data, etag)
+            self._entries.set(versioned_key, entry)
+        return entry
+
+    def stats(self):
+        return {**self._entries.stats(), "versions": dict(self._versions)}
@@ -1,54 +1,51 @@
-from flask import Blueprint, request, jsonify
-from app import supabase, client
-from middlewares.auth import token_required
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.services import get_llm
+from app.llm import LLMBusyError
+from app.cache import TTLCache
+from app.chatbot.history import create_history_store
+from app.chatbot.tokens import make_message, message_tokens, fit_to_budget
+from app.chatbot.retrieval import article_retriever
+from app.writebehind import create_queue
+from middlewares.auth import token_required, is_admin
+from config import (
+    INTERACTION_BATCH_SIZE, INTERACTION_FLUSH_INTERVAL, INTERACTION_QUEUE_SIZE, INTERACTION_MAX_RETRIES,
+    CHAT_HISTORY_BACKEND, CHAT_HISTORY_PATH, CHAT_HISTORY_TTL, CHAT_HISTORY_MAX_MESSAGES,
+    CHAT_HISTORY_MAX_USER_CHARS, CHAT_HISTORY_MAX_TOTAL_CHARS, CHAT_HISTORY_MAX_TOTAL_MESSAGES,
+    CHAT_HISTORY_MAX_USERS, CHAT_TOKEN_BUDGET, CHAT_CACHE_ENABLED, CHAT_CACHE_SIZE, CHAT_CACHE_TTL,
+    CHAT_RAG_ENABLED, CHAT_RAG_TOP_K, CHAT_RAG_TOKEN_BUDGET,
+)
+import hashlib
+import json
+import re
 import uuid
 from datetime import datetime
 
 chatbot = Blueprint('chatbot', __name__)
 
-# Dictionary to store chat history for each user
-chat_history = {}
+CHAT_MODEL = "deepseek-chat"
 
-def estimate_tokens(text):
-    """
-    Estimate the number of tokens based on the length of the text.
-    - 1 token ≈ 4 characters (English text)
-    - This is a heuristic and may not be 100% accurate.
-    """
-    return len(text) // 4
+# Bounded store of each user's recent messages (see CHAT_HISTORY_BACKEND)
+chat_history = create_history_store(
+    CHAT_HISTORY_BACKEND,
+    path=CHAT_HISTORY_PATH,
+    ttl=CHAT_HISTORY_TTL,
+    max_messages=CHAT_HISTORY_MAX_MESSAGES,
+    max_user_chars=CHAT_HISTORY_MAX_USER_CHARS,
+    max_total_chars=CHAT_HISTORY_MAX_TOTAL_CHARS,
+    max_total_messages=CHAT_HISTORY_MAX_TOTAL_MESSAGES,
+    max_users=CHAT_HISTORY_MAX_USERS,
+)
 
-def count_tokens(messages):
-    """Count the estimated number of tokens in the chat history."""
-    total_tokens = 0
-    for msg in messages:
-        total_tokens += estimate_tokens(msg["content"])
-    return total_tokens
+# Interactions are persisted in bulk off the request path
+interaction_writer = create_queue(
+    "chatbotinteractions",
+    batch_size=INTERACTION_BATCH_SIZE,
+    flush_interval=INTERACTION_FLUSH_INTERVAL,
+    maxsize=INTERACTION_QUEUE_SIZE,
+    max_retries=INTERACTION_MAX_RETRIES,
+)
 
-@chatbot.route('/chat', methods=['POST'])
-@token_required
-def chat(user):
-    """Handle user queries and store interactions"""
-    
-    data = request.get_json()
-    user_query = data.get("user_query")
-    user_id = user["id"]  # Accessing the user ID passed through the token
-
-    if not user_query or not user_id:
-        return jsonify({"error": "User query and user ID are required"}), 400
-
-    # Initialize chat history for the user if it doesn't exist
-    if user_id not in chat_history:
-        chat_history[user_id] = []
-
-    # Add the user's query to the chat history
-    chat_history[user_id].append({"role": "user", "content": user_query})
-
-    # Truncate chat history if estimated token count exceeds 3000
-    if count_tokens(chat_history[user_id]) > 3000:
-        chat_history[user_id] = chat_history[user_id][-3:]  # Keep only the last 3 messages
-
-    # Generate AI response
-    instructions = ''' 
+SYSTEM_PROMPT = ''' 
     You are integrated into the DSA Tutor Project. Your primary role is to assist users with questions related to **Data Structures and Algorithms (DSA)**. You must strictly follow these rules:
 
 DSA Tutor Project - Instructions
@@ -97,24 +94,88 @@ A: (Highlight incorrect line only, no explanation)
 Strict Enforcement:
 If the user deviates, remind them to ask a DSA-related question.
 No exceptions to off-topic discussions.
-    '''
-    # Prepare the messages for the AI model
-    messages = [
-        {"role": "system", "content": instructions},
-        *chat_history[user_id],  # Include the chat history
-    ]
+'''
+
+# Introduces the retrieved article excerpts (see article_context)
+CONTEXT_HEADER = (
+    "Excerpts from DSA Tutor articles that may be relevant to the question. "
+    "Base your answer on them when they apply, and follow the rules above.\n\n"
+)
 
-    # Get the AI response
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        stream=False
+# Counted once; the system prompt is part of every request's budget
+SYSTEM_PROMPT_TOKENS = message_tokens(SYSTEM_PROMPT)
+
+# Changes whenever the model or system prompt changes, so stale answers are never served
+PROMPT_VERSION = hashlib.sha256(f"{CHAT_MODEL}\n{SYSTEM_PROMPT}".encode()).hexdigest()[:12]
+
+# Answers to first-turn questions, keyed by normalized query + prompt version
+response_cache = TTLCache(maxsize=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+
+# A ``` fenced block, up to its closing fence or the end of the text
+CODE_FENCE = re.compile(r"(```.*?(?:```|$))", re.S)
+
+def normalize_query(query):
+    """Canonical form of a question: trimmed, no trailing "?!." and, outside code
+    fences, repeated spaces within a line folded into one. Case, line breaks,
+    indentation and fenced code are kept, since they change what pasted code means."""
+    parts = CODE_FENCE.split(query.replace("\r\n", "\n").strip())
+    for i in range(0, len(parts), 2):  # Even parts are outside the fences
+        parts[i] = "\n".join(re.sub(r"(?<=\S)[ \t]+", " ", line).rstrip() for line in parts[i].split("\n"))
+    return "".join(parts).rstrip(" ?!.")
+
+def response_cache_key(user_id, user_query):
+    """Cache key for the query, or None when the answer would depend on prior history"""
+    if not CHAT_CACHE_ENABLED or chat_history.total_tokens(user_id) > 0:
+        return None
+    # Answers are grounded in the articles, so editing them retires the cached answers
+    corpus_version = article_retriever.version if CHAT_RAG_ENABLED else "off"
+    query_hash = hashlib.sha256(normalize_query(user_query).encode()).hexdigest()
+    return f"{PROMPT_VERSION}:{corpus_version}:{query_hash}"
+
+def cache_answer(cache_key, bot_response):
+    """Store an answer for reuse; empty answers (failed or filtered generations) are not kept"""
+    if cache_key and bot_response and bot_response.strip():
+        response_cache.set(cache_key, bot_response)
+
+def article_context(user_query):
+    """System message with the article excerpts most relevant to the query, or None"""
+    if not CHAT_RAG_ENABLED:
+        return None
+    excerpts = article_retriever.retrieve(
+        user_query, CHAT_RAG_TOKEN_BUDGET - message_tokens(CONTEXT_HEADER), top_k=CHAT_RAG_TOP_K
     )
+    if not excerpts:
+        return None
+    return CONTEXT_HEADER + "\n\n".join(f"[{e['title']}]\n{e['text']}" for e in excerpts)
+
+def prepare_messages(user_id, user_query):
+    """Build the message list for the model from the user's history and the new query.
+
+    The history itself is only updated by save_interaction once an answer
+    exists, so a failed or rejected call leaves no unanswered question behind.
+    """
+    question = make_message("user", user_query)
+    history = chat_history.get(user_id) + [question]
+
+    # Excerpts from our articles come out of the budget before the history does
+    context = article_context(user_query)
+    budget = CHAT_TOKEN_BUDGET - SYSTEM_PROMPT_TOKENS - (message_tokens(context) if context else 0)
 
-    bot_response = response.choices[0].message.content
+    # Keep as many recent messages as fit next to the system prompt in the token budget
+    if chat_history.total_tokens(user_id) + question["tokens"] > budget:
+        history = fit_to_budget(history, budget)
 
-    # Add the bot's response to the chat history
-    chat_history[user_id].append({"role": "assistant", "content": bot_response})
+    # Prepare the messages for the AI model (token counts are for our bookkeeping only)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *([{"role": "system", "content": context}] if context else []),
+        *({"role": m["role"], "content": m["content"]} for m in history),  # Include the chat history
+    ]
+
+def save_interaction(user_id, user_query, bot_response):
+    """Record the exchange in the history and queue it for Supabase, returning the interaction id"""
+    # Add the user's query and the bot's response to the chat history together
+    chat_history.append(user_id, make_message("user", user_query), make_message("assistant", bot_response))
 
     # Generate a new UUID for the interaction
     interaction_id = str(uuid.uuid4())
@@ -122,7 +183,7 @@ No exceptions to off-topic discussions.
     # Current timestamp (use datetime now)
     timestamp = datetime.now().isoformat()  # This ensures correct formatting for Supabase
 
-    # Store interaction in Supabase
+    # Queue interaction for a batched insert into Supabase
     interaction_data = {
         "id": interaction_id,
         "user_id": user_id,
@@ -131,10 +192,147 @@ No exceptions to off-topic discussions.
         "timestamp": timestamp  # Correctly formatted timestamp
     }
 
-    supabase.table("chatbotinteractions").insert(interaction_data).execute()
+    interaction_writer.submit(interaction_data)
+    return interaction_id
+
+def busy_response(error):
+    """503 telling the client to retry once the LLM gateway has capacity"""
+    response = jsonify({"error": "The tutor is busy right now, please try again shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def sse_event(data, event=None):
+    """Format a payload as a Server-Sent Event"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@chatbot.route('/chat', methods=['POST'])
+@token_required
+def chat(user):
+    """Handle user queries and store interactions"""
+    
+    data = request.get_json()
+    user_query = data.get("user_query")
+    user_id = user["id"]  # Accessing the user ID passed through the token
+
+    if not user_query or not user_id:
+        return jsonify({"error": "User query and user ID are required"}), 400
+
+    cache_key = response_cache_key(user_id, user_query)
+    bot_response = response_cache.get(cache_key) if cache_key else None
+    cached = bot_response is not None
+
+    if not cached:
+        messages = prepare_messages(user_id, user_query)
+        # Get the AI response
+        try:
+            response = get_llm().chat_completion(model=CHAT_MODEL, messages=messages)
+        except LLMBusyError as e:
+            return busy_response(e)
+
+        bot_response = response.choices[0].message.content
+        cache_answer(cache_key, bot_response)
+
+    interaction_id = save_interaction(user_id, user_query, bot_response)
 
     return jsonify({
         "interaction_id": interaction_id,
         "user_query": user_query,
-        "bot_response": bot_response
-    })
\ No newline at end of file
+        "bot_response": bot_response,
+        "cached": cached
+    })
+
+@chatbot.route('/chat/stream', methods=['POST'])
+@token_required
+def chat_stream(user):
+    """Stream the AI response as Server-Sent Events while it is generated"""
+    data = request.get_json()
+    user_query = data.get("user_query")
+    user_id = user["id"]
+
+    if not user_query or not user_id:
+        return jsonify({"error": "User query and user ID are required"}), 400
+
+    cache_key = response_cache_key(user_id, user_query)
+    cached_response = response_cache.get(cache_key) if cache_key else None
+
+    stream = None
+    if cached_response is None:
+        # Open the stream up front so an overloaded gateway can still answer 503
+        try:
+            stream = get_llm().open_stream(model=CHAT_MODEL, messages=prepare_messages(user_id, user_query))
+        except LLMBusyError as e:
+            return busy_response(e)
+        except Exception as e:
+            print("🚨 Chat stream error:", str(e))
+            return jsonify({"error": "Failed to generate a response"}), 502
+
+    def generate():
+        if cached_response is not None:
+            interaction_id = save_interaction(user_id, user_query, cached_response)
+            yield sse_event({"delta": cached_response})
+            yield sse_event(
+                {"interaction_id": interaction_id, "bot_response": cached_response, "cached": True},
+                event="done"
+            )
+            return
+
+        parts = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+
+            # The full answer is only known once the stream ends
+            bot_response = "".join(parts)
+            cache_answer(cache_key, bot_response)
+            interaction_id = save_interaction(user_id, user_query, bot_response)
+            yield sse_event(
+                {"interaction_id": interaction_id, "bot_response": bot_response, "cached": False},
+                event="done"
+            )
+
+        except Exception as e:
+            print("🚨 Chat stream error:", str(e))
+            yield sse_event({"error": "Failed to generate a response"}, event="error")
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    if stream is not None:
+        # Frees the LLM slot even if the client disconnects before the body is read
+        response.call_on_close(stream.close)
+    return response
+
+@chatbot.route('/chat/stats', methods=['GET'])
+@token_required
+def chat_stats(user):
+    """Only Admin can view chat history, cache, persistence, retrieval and LLM gateway statistics"""
+    if not is_admin(user):
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    return jsonify({
+        "history": chat_history.stats(),
+        "response_cache": {**response_cache.stats(), "prompt_version": PROMPT_VERSION},
+        "interactions": interaction_writer.stats(),
+        "retrieval": article_retriever.stats(),
+        "llm": get_llm().stats()
+    })
+
+@chatbot.route('/chat/cache', methods=['DELETE'])
+@token_required
+def flush_response_cache(user):
+    """Only Admin can flush cached chatbot answers"""
+    if not is_admin(user):
+        return jsonify({"error": "Unauthorized: Admin access required"}), 403
+
+    flushed = len(response_cache)
+    response_cache.clear()
+    return jsonify({"message": "Response cache flushed successfully!", "flushed": flushed})
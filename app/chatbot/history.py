@@ -0,0 +1,362 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from app.chatbot.tokens import make_message
+
+
+class HistoryStore(ABC):
+    """Interface for per-user chat history backends"""
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return a copy of the user's messages, oldest first"""
+
+    @abstractmethod
+    def append(self, user_id, *messages):
+        """Add messages after the user's existing ones"""
+
+    @abstractmethod
+    def total_tokens(self, user_id):
+        """Sum of the cached token counts of the user's messages"""
+
+    @abstractmethod
+    def replace(self, user_id, messages):
+        """Swap the user's whole history for `messages`"""
+
+    @abstractmethod
+    def clear(self, user_id):
+        """Forget the user's history"""
+
+    @abstractmethod
+    def stats(self):
+        """Counters for /chat/stats"""
+
+
+def message_size(message):
+    """Approximate memory footprint of a message in characters"""
+    return len(message["content"])
+
+
+def message_token_count(message):
+    return message.get("tokens", 0)
+
+
+class MemoryHistoryStore(HistoryStore):
+    """In-process history with LRU + TTL eviction and per-user and global size caps.
+
+    Only visible to the current process; use SQLiteHistoryStore when the
+    app runs with more than one worker.
+    """
+
+    def __init__(self, max_users=10000, max_messages=50, max_user_chars=32000,
+                 max_total_chars=64_000_000, ttl=3600):
+        self.max_users = max_users
+        self.max_messages = max_messages
+        self.max_user_chars = max_user_chars
+        self.max_total_chars = max_total_chars
+        self.ttl = ttl
+        # user_id -> {"messages": [...], "chars": int, "tokens": int, "touched": float}
+        self._users = OrderedDict()
+        self._total_chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.user_evictions = 0
+        self.message_evictions = 0
+
+    def _entry(self, user_id, create=False):
+        entry = self._users.get(user_id)
+        now = time.monotonic()
+        if entry is not None and now - entry["touched"] > self.ttl:
+            self._drop(user_id)
+            entry = None
+
+        if entry is None:
+            if not create:
+                return None
+            entry = {"messages": [], "chars": 0, "tokens": 0, "touched": now}
+            self._users[user_id] = entry
+
+        entry["touched"] = now
+        self._users.move_to_end(user_id)
+        return entry
+
+    def _drop(self, user_id):
+        entry = self._users.pop(user_id)
+        self._total_chars -= entry["chars"]
+        self.user_evictions += 1
+
+    def _forget(self, entry, message):
+        size = message_size(message)
+        entry["chars"] -= size
+        entry["tokens"] -= message_token_count(message)
+        self._total_chars -= size
+
+    def _trim(self, entry):
+        """Drop the user's oldest turns until they are within the per-user caps.
+
+        A turn is a user message and the replies after it, so the history never
+        starts with an answer to a dropped question. The newest message is always
+        kept; if it alone exceeds max_user_chars it is cut down to that size
+        rather than leaving the user with no history.
+        """
+        messages = entry["messages"]
+        while len(messages) > 1 and (len(messages) > self.max_messages or entry["chars"] > self.max_user_chars):
+            self._forget(entry, messages.pop(0))
+            self.message_evictions += 1
+            while len(messages) > 1 and messages[0]["role"] != "user":
+                self._forget(entry, messages.pop(0))
+                self.message_evictions += 1
+
+        if messages and entry["chars"] > self.max_user_chars:
+            newest = messages[-1]
+            self._forget(entry, newest)
+            newest = messages[-1] = make_message(newest["role"], newest["content"][:self.max_user_chars])
+            size = message_size(newest)
+            entry["chars"] += size
+            entry["tokens"] += message_token_count(newest)
+            self._total_chars += size
+
+    def _enforce_global_caps(self, keep_user_id):
+        """Evict least recently used users until the store is within its global caps"""
+        while self._users and (len(self._users) > self.max_users or self._total_chars > self.max_total_chars):
+            oldest = next(iter(self._users))
+            if oldest == keep_user_id and len(self._users) == 1:
+                break
+            self._drop(oldest)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None or not entry["messages"]:
+                self.misses += 1
+                return []
+            self.hits += 1
+            return list(entry["messages"])
+
+    def append(self, user_id, *messages):
+        with self._lock:
+            entry = self._entry(user_id, create=True)
+            for message in messages:
+                size = message_size(message)
+                entry["messages"].append(message)
+                entry["chars"] += size
+                entry["tokens"] += message_token_count(message)
+                self._total_chars += size
+            self._trim(entry)
+            self._enforce_global_caps(user_id)
+
+    def replace(self, user_id, messages):
+        with self._lock:
+            entry = self._entry(user_id, create=True)
+            self._total_chars -= entry["chars"]
+            entry["messages"] = list(messages)
+            entry["chars"] = sum(message_size(m) for m in messages)
+            entry["tokens"] = sum(message_token_count(m) for m in messages)
+            self._total_chars += entry["chars"]
+            self._trim(entry)
+            self._enforce_global_caps(user_id)
+
+    def total_tokens(self, user_id):
+        with self._lock:
+            entry = self._entry(user_id)
+            return entry["tokens"] if entry else 0
+
+    def clear(self, user_id):
+        with self._lock:
+            if user_id in self._users:
+                entry = self._users.pop(user_id)
+                self._total_chars -= entry["chars"]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "users": len(self._users),
+            "total_chars": self._total_chars,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "user_evictions": self.user_evictions,
+            "message_evictions": self.message_evictions,
+        }
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History kept in a local SQLite file so every worker process on the host shares it.
+
+    Uses WAL mode so readers in one worker do not block writers in another.
+    """
+
+    def __init__(self, path, max_messages=50, max_total_messages=500_000, ttl=3600):
+        self.path = path
+        self.max_messages = max_messages
+        self.max_total_messages = max_total_messages
+        self.ttl = ttl
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.message_evictions = 0
+        self._writes = 0
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_history ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id TEXT NOT NULL,"
+                " message TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS chat_history_user ON chat_history (user_id, seq)")
+
+    def _connect(self):
+        # sqlite3 connections must not be shared across threads or forked processes
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA busy_timeout=10000")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def get(self, user_id):
+        db = self._connect()
+        cutoff = time.time() - self.ttl
+        rows = db.execute(
+            "SELECT message, created_at FROM chat_history WHERE user_id = ? ORDER BY seq",
+            (user_id,),
+        ).fetchall()
+
+        # A conversation expires as a whole once its latest message is older than the TTL
+        if rows and rows[-1][1] < cutoff:
+            self.clear(user_id)
+            rows = []
+
+        if not rows:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return [json.loads(message) for message, _ in rows]
+
+    def append(self, user_id, *messages):
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO chat_history (user_id, message, created_at) VALUES (?, ?, ?)",
+                [(user_id, json.dumps(message), now) for message in messages],
+            )
+            self._trim(db, user_id)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._after_write(db)
+
+    def replace(self, user_id, messages):
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM chat_history WHERE user_id = ?", (user_id,))
+            db.executemany(
+                "INSERT INTO chat_history (user_id, message, created_at) VALUES (?, ?, ?)",
+                [(user_id, json.dumps(message), now) for message in messages],
+            )
+            self._trim(db, user_id)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._after_write(db)
+
+    def total_tokens(self, user_id):
+        # Bounded by max_messages rows, served from the (user_id, seq) index.
+        # An expired conversation counts as empty, as it does in get().
+        total, = self._connect().execute(
+            "SELECT CASE WHEN MAX(created_at) >= ? THEN SUM(json_extract(message, '$.tokens')) ELSE 0 END"
+            " FROM chat_history WHERE user_id = ?",
+            (time.time() - self.ttl, user_id),
+        ).fetchone()
+        return total or 0
+
+    def clear(self, user_id):
+        self._connect().execute("DELETE FROM chat_history WHERE user_id = ?", (user_id,))
+
+    def _trim(self, db, user_id):
+        """Keep only the user's newest `max_messages` messages, starting at a user message.
+
+        Like MemoryHistoryStore, whole turns are dropped so the history never
+        starts with an answer; the newest message is always kept.
+        """
+        cursor = db.execute(
+            "DELETE FROM chat_history WHERE user_id = ? AND seq < COALESCE("
+            " (SELECT MIN(seq) FROM (SELECT seq, message FROM chat_history WHERE user_id = ? ORDER BY seq DESC LIMIT ?)"
+            "  WHERE json_extract(message, '$.role') = 'user'),"
+            " (SELECT MAX(seq) FROM chat_history WHERE user_id = ?))",
+            (user_id, user_id, max(self.max_messages, 1), user_id),
+        )
+        self.message_evictions += cursor.rowcount
+
+    def _after_write(self, db):
+        """Periodically purge expired conversations and enforce the global cap"""
+        self._writes += 1
+        if self._writes % 100:
+            return
+
+        cursor = db.execute(
+            "DELETE FROM chat_history WHERE user_id IN ("
+            " SELECT user_id FROM chat_history GROUP BY user_id HAVING MAX(created_at) < ?)",
+            (time.time() - self.ttl,),
+        )
+        self.message_evictions += cursor.rowcount
+
+        cursor = db.execute(
+            "DELETE FROM chat_history WHERE seq <= ("
+            " SELECT seq FROM chat_history ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (self.max_total_messages,),
+        )
+        self.message_evictions += cursor.rowcount
+
+    def stats(self):
+        db = self._connect()
+        users, messages = db.execute(
+            "SELECT COUNT(DISTINCT user_id), COUNT(*) FROM chat_history"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "users": users,
+            "messages": messages,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "message_evictions": self.message_evictions,
+        }
+
+
+def create_history_store(backend="memory", **options):
+    """Build the history store named by CHAT_HISTORY_BACKEND ("auto" is memory unless gunicorn.conf.py chose sqlite)"""
+    if backend in ("memory", "auto"):
+        return MemoryHistoryStore(
+            max_users=options["max_users"],
+            max_messages=options["max_messages"],
+            max_user_chars=options["max_user_chars"],
+            max_total_chars=options["max_total_chars"],
+            ttl=options["ttl"],
+        )
+    if backend == "sqlite":
+        return SQLiteHistoryStore(
+            options["path"],
+            max_messages=options["max_messages"],
+            max_total_messages=options["max_total_messages"],
+            ttl=options["ttl"],
+        )
+    raise ValueError(f"Unknown chat history backend: {backend}")
@@ -0,0 +1,248 @@
+# Retrieval for the chatbot: articles are split into chunks and embedded as hashed
+# TF-IDF vectors (one row per chunk in a NumPy matrix). For each question the most
+# similar chunks that fit in a token budget are added to the prompt, so answers
+# follow our own articles.
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from app.content_index import BackgroundIndex, content_loader
+from app.chatbot.tokens import count_text_tokens
+from app.metrics import span
+from app.search import tokenize
+from app.signals import content_changed
+from config import (
+    CHAT_RAG_ENABLED, CHAT_RAG_DIMENSIONS, CHAT_RAG_CHUNK_TOKENS, CHAT_RAG_MIN_SCORE,
+)
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+MAX_CHUNKS_PER_ARTICLE = 2  # In one answer's context, so a single article cannot crowd out the rest
+
+
+def split_chunks(text, max_tokens):
+    """Split text into chunks of about max_tokens, made of whole paragraphs where possible"""
+    chunks = []
+    current, used = [], 0
+
+    def flush():
+        nonlocal current, used
+        if current:
+            chunks.append("\n\n".join(current))
+        current, used = [], 0
+
+    for paragraph in PARAGRAPH_BREAK.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_text_tokens(paragraph)
+        if used + tokens <= max_tokens:
+            current.append(paragraph)
+            used += tokens
+            continue
+        if tokens <= max_tokens:
+            flush()
+            current, used = [paragraph], tokens
+            continue
+
+        # A paragraph longer than a chunk fills the current chunk, then continues in full-size runs of words
+        words = paragraph.split()
+        tokens_per_word = tokens / len(words)
+        while words:
+            room = int((max_tokens - used) / tokens_per_word)
+            if room < len(words) and used > max_tokens // 2:
+                flush()
+                continue
+            piece, words = " ".join(words[:max(room, 1)]), words[max(room, 1):]
+            current.append(piece)
+            used += count_text_tokens(piece)
+            if words:
+                flush()
+    flush()
+    return chunks
+
+
+def article_chunks(row, max_tokens):
+    return [
+        {"article_id": str(row["id"]), "title": row.get("title") or "", "text": text, "tokens": count_text_tokens(text)}
+        for text in split_chunks(row.get("content"), max_tokens)
+    ]
+
+
+def fingerprint(row):
+    return hashlib.sha256(f"{row.get('title')}\n{row.get('content')}".encode()).hexdigest()[:16]
+
+
+class ArticleRetriever(BackgroundIndex):
+    """Hashed TF-IDF vectors of article chunks, searched by cosine similarity.
+
+    Loaded by content_loader from its shared read of the articles table, and
+    re-embedded when admin writes change articles (content_changed signal).
+    """
+
+    def __init__(self, dimensions=2048, chunk_tokens=200, min_score=0.1):
+        super().__init__()
+        self.dimensions = dimensions
+        self.chunk_tokens = chunk_tokens
+        self.min_score = min_score
+        self._write_lock = threading.Lock()  # Serializes rebuilds and admin updates
+        self._articles = {}  # article id -> (fingerprint, chunks)
+        self._chunks = []  # Row i of the matrix embeds _chunks[i]
+        self._matrix = None  # (chunks x dimensions) float32, rows L2-normalized
+        self._idf = None
+        self.version = "empty"  # Changes whenever the indexed article text changes
+        self._latencies = deque(maxlen=1000)
+
+    # --- Embedding ---
+
+    def _features(self, text):
+        """Hashed term counts of a text: {dimension: count}.
+
+        Each term adds +1 or -1 (from another bit of its hash), so terms sharing a
+        dimension tend to cancel out instead of looking like one frequent term.
+        """
+        counts = {}
+        for term in tokenize(text):
+            hashed = zlib.crc32(term.encode())
+            index = hashed % self.dimensions
+            counts[index] = counts.get(index, 0) + (1 if hashed >> 31 else -1)
+        return {index: count for index, count in counts.items() if count}
+
+    def _embed(self, chunks):
+        """Matrix and IDF weights for the chunks"""
+        import numpy as np  # Loaded with the first build rather than at boot
+
+        matrix = np.zeros((len(chunks), self.dimensions), dtype=np.float32)
+        for row, chunk in enumerate(chunks):
+            features = self._features(f"{chunk['title']}\n{chunk['text']}")
+            if features:
+                matrix[row, list(features)] = list(features.values())
+
+        # Sublinear term frequency times inverse document frequency, per hashed dimension
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((1 + len(chunks)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix)) * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+        return matrix, idf
+
+    def _reindex(self, articles):
+        """Embed `articles` ({id: (fingerprint, chunks)}) and swap the result in"""
+        chunks = [chunk for _, article_chunks in articles.values() for chunk in article_chunks]
+        matrix, idf = self._embed(chunks)
+        digest = hashlib.sha256()
+        for article_id in sorted(articles):
+            digest.update(f"{article_id}:{articles[article_id][0]};".encode())
+
+        # Queries only wait for the swap, not for the embedding
+        with self._lock:
+            self._matrix, self._idf, self._chunks, self._articles = matrix, idf, chunks, articles
+            self.version = digest.hexdigest()[:12]
+
+    # --- Lifecycle ---
+
+    def load(self, articles, questions):
+        """Embed the chunks of every article, reusing the chunking of articles whose text is unchanged"""
+        previous = self._articles
+        indexed = {}
+        for row in articles:
+            article_id, text = str(row["id"]), fingerprint(row)
+            known = previous.get(article_id)
+            indexed[article_id] = known if known and known[0] == text else (text, article_chunks(row, self.chunk_tokens))
+
+        with self._write_lock:
+            self._reindex(indexed)
+
+    def apply_change(self, ids=(), rows=()):
+        """Re-embed after an admin write to articles; rows are the written rows (empty on delete)"""
+        with self._write_lock:
+            self._generation += 1
+            if not self.loaded:
+                return
+            articles = dict(self._articles)
+            for article_id in ids:
+                articles.pop(str(article_id), None)
+            for row in rows:
+                articles[str(row["id"])] = (fingerprint(row), article_chunks(row, self.chunk_tokens))
+            self._reindex(articles)
+
+    # --- Queries ---
+
+    def retrieve(self, query, token_budget, top_k=4):
+        """The chunks most similar to `query`, best first, whose tokens fit in `token_budget`"""
+        self._check_fresh()
+        started = time.perf_counter()
+        with span("retrieval", "articles"):
+            selected = self._retrieve(query, token_budget, top_k)
+        self._latencies.append(time.perf_counter() - started)
+        return selected
+
+    def _retrieve(self, query, token_budget, top_k):
+        import numpy as np
+
+        with self._lock:
+            matrix, idf, chunks = self._matrix, self._idf, self._chunks
+        if matrix is None or not chunks or token_budget <= 0:
+            return []
+
+        features = self._features(query)
+        if not features:
+            return []
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        vector[list(features)] = list(features.values())
+        vector = np.sign(vector) * np.log1p(np.abs(vector)) * idf
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+
+        scores = matrix @ vector
+        candidates = min(len(chunks), top_k * 4)
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        best = best[np.argsort(-scores[best])]
+
+        selected = []
+        used = 0
+        per_article = {}
+        for row in best:
+            score = float(scores[row])
+            if score < self.min_score or len(selected) == top_k:
+                break
+            chunk = chunks[row]
+            if per_article.get(chunk["article_id"], 0) >= MAX_CHUNKS_PER_ARTICLE or used + chunk["tokens"] > token_budget:
+                continue
+            selected.append({**chunk, "score": round(score, 4)})
+            per_article[chunk["article_id"]] = per_article.get(chunk["article_id"], 0) + 1
+            used += chunk["tokens"]
+        return selected
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3) if latencies else 0.0
+
+        return {
+            "loaded": self.loaded,
+            "version": self.version,
+            "articles": len(self._articles),
+            "chunks": len(self._chunks),
+            "dimensions": self.dimensions,
+            "matrix_bytes": int(self._matrix.nbytes) if self._matrix is not None else 0,
+            "retrieval_ms_p50": percentile(0.50),
+            "retrieval_ms_p95": percentile(0.95),
+            "retrieval_ms_max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+
+
+article_retriever = ArticleRetriever(
+    dimensions=CHAT_RAG_DIMENSIONS,
+    chunk_tokens=CHAT_RAG_CHUNK_TOKENS,
+    min_score=CHAT_RAG_MIN_SCORE,
+)
+if CHAT_RAG_ENABLED:
+    content_loader.register(article_retriever)
+
+
+@content_changed.connect
+def update_article_retriever(table, ids=(), rows=(), **kwargs):
+    if table == "articles":
+        article_retriever.apply_change(ids, rows)
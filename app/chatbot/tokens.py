@@ -0,0 +1,76 @@
+from config import CHAT_TOKENIZER
+
+# Chat formatting adds a few tokens per message on top of its content
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens based on the length of the text.
+    - 1 token ≈ 4 characters (English text)
+    - This is a heuristic and may not be 100% accurate.
+    """
+    return len(text) // 4
+
+
+def load_tokenizer(spec):
+    """
+    Return a function counting tokens in a string for a CHAT_TOKENIZER spec:
+    - "heuristic": the 4-characters-per-token estimate
+    - "tiktoken:<encoding>": a tiktoken encoding, e.g. tiktoken:cl100k_base
+    - "huggingface:<repo>": a Hugging Face tokenizer, e.g. huggingface:deepseek-ai/DeepSeek-V3
+    Falls back to the heuristic when the tokenizer library is not installed.
+    """
+    backend, _, name = spec.partition(":")
+    try:
+        if backend == "tiktoken":
+            import tiktoken
+            encoding = tiktoken.get_encoding(name or "cl100k_base")
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        if backend == "huggingface":
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_pretrained(name)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+    except Exception as e:
+        print(f"⚠️ Could not load tokenizer '{spec}', using the length heuristic:", str(e))
+    return estimate_tokens
+
+
+count_text_tokens = load_tokenizer(CHAT_TOKENIZER)
+
+
+def message_tokens(content):
+    """Tokens a message with this content adds to the prompt"""
+    return count_text_tokens(content) + MESSAGE_OVERHEAD
+
+
+def make_message(role, content):
+    """Build a history message carrying its token count, so it is only counted once"""
+    return {"role": role, "content": content, "tokens": message_tokens(content)}
+
+
+def fit_to_budget(messages, budget):
+    """Keep the newest messages whose combined tokens fit in `budget`, in whole turns.
+
+    The latest message is always kept, even if it alone exceeds the budget.
+    Older messages are kept a turn at a time (a user message and the replies
+    after it), so the window never starts with an answer to a dropped question.
+    """
+    if not messages:
+        return []
+    latest = messages[-1]
+    kept = [latest]
+    used = latest.get("tokens") or message_tokens(latest["content"])
+    turn, turn_tokens = [], 0
+    for message in reversed(messages[:-1]):
+        turn.append(message)
+        turn_tokens += message.get("tokens") or message_tokens(message["content"])
+        if message["role"] != "user":
+            continue
+        if used + turn_tokens > budget:
+            break
+        kept.extend(turn)
+        used += turn_tokens
+        turn, turn_tokens = [], 0
+    kept.reverse()
+    return kept
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from app.services import get_supabase, bind_services
+from app.models import Article
+from app.signals import content_changed
+from config import CONTENT_INDEX_REFRESH
+
+PAGE_SIZE = 1000  # PostgREST's default max rows per response
+RETRY_INTERVAL = 30  # Seconds between build attempts after a failure
+ARTICLE_COLUMNS = "id,title,category,content"  # What any index needs, read once for all of them
+
+
+def fetch_all(table, columns, **filters):
+    """Read a whole table, or the rows matching column=value filters, page by page (keyset on id)"""
+    rows = []
+    cursor = None
+    while True:
+        query = get_supabase().table(table).select(columns).order("id").limit(PAGE_SIZE)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if cursor is not None:
+            query = query.gt("id", cursor)
+        page = query.execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        cursor = page[-1]["id"]
+
+
+class BackgroundIndex(ABC):
+    """Base for the in-memory indexes over the articles and practice questions tables.
+
+    content_loader fills every registered index from one read of both tables,
+    in the background at startup and again every CONTENT_INDEX_REFRESH seconds
+    so changes made through other worker processes show up too. In between,
+    admin writes in this process patch the indexes through content_changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded_at = None
+        self._generation = 0  # Bumped by every admin write
+        self._loaded_from = None  # (rows digest, generation) of the last load
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    @abstractmethod
+    def load(self, articles, questions):
+        """Replace the index contents with ones built from full reads of both tables"""
+
+    def _check_fresh(self):
+        if not self.loaded or time.monotonic() - self.loaded_at > content_loader.refresh_interval:
+            content_loader.warm()
+
+    def _refresh(self, articles, questions, digest, generation):
+        """Load the rows unless the index was already built from the same rows with no admin write since"""
+        if self._loaded_from != (digest, generation) or generation != self._generation:
+            self.load(articles, questions)
+        with self._lock:
+            self.loaded_at = time.monotonic()
+            self._loaded_from = (digest, generation)
+            if generation != self._generation:
+                # An admin write raced with the read; reload on the next lookup
+                self.loaded_at -= content_loader.refresh_interval
+
+
+class ContentLoader:
+    """Reads the articles and practice questions tables once for all registered indexes"""
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self._indexes = []
+        self._lock = threading.Lock()
+        self._building_pid = None
+        self._last_attempt = None
+
+    def register(self, index):
+        self._indexes.append(index)
+        return index
+
+    def build(self):
+        """Read both tables and load every registered index from the rows"""
+        indexes = [(index, index._generation) for index in self._indexes]
+        articles = fetch_all("articles", ARTICLE_COLUMNS)
+        questions = fetch_all("practicequestions", "*")
+        digest = hashlib.sha256(json.dumps([articles, questions], sort_keys=True, default=str).encode()).hexdigest()
+
+        for index, generation in indexes:
+            try:
+                index._refresh(articles, questions, digest, generation)
+            except Exception as e:
+                print(f"🚨 {type(index).__name__} build failed:", str(e))
+
+    def warm(self):
+        """Run build() in a background thread unless one is already running in this process"""
+        with self._lock:
+            if self._building_pid == os.getpid():
+                return
+            if self._last_attempt is not None and time.monotonic() - self._last_attempt < RETRY_INTERVAL:
+                return
+            self._building_pid = os.getpid()
+            self._last_attempt = time.monotonic()
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print("🚨 Content index build failed:", str(e))
+            finally:
+                self._building_pid = None
+
+        threading.Thread(target=bind_services(run), name="content-loader", daemon=True).start()
+
+
+content_loader = ContentLoader(refresh_interval=CONTENT_INDEX_REFRESH)
+
+
+class ContentIndex(BackgroundIndex):
+    """Article -> category map and category -> practice questions index"""
+
+    def __init__(self):
+        super().__init__()
+        self._articles = {}  # article id -> {"id", "title", "category"}
+        self._questions = {}  # question id -> question row
+        self._by_category = {}  # category -> {question id: question row}
+
+    def load(self, articles, questions):
+        questions = {str(q["id"]): dict(q) for q in questions}
+        by_category = {}
+        for question_id, question in questions.items():
+            by_category.setdefault(question.get("category"), {})[question_id] = question
+
+        with self._lock:
+            self._articles = {str(a["id"]): {c: a.get(c) for c in Article.summary_columns} for a in articles}
+            self._questions = questions
+            self._by_category = by_category
+
+    def article(self, article_id):
+        """Summary of an article, or None if it is not (yet) indexed"""
+        self._check_fresh()
+        return self._articles.get(str(article_id))
+
+    def questions_for(self, category):
+        """Questions in a category, or None while the index is not loaded"""
+        self._check_fresh()
+        if not self.loaded:
+            return None
+        return list(self._by_category.get(category, {}).values())
+
+    def question(self, question_id):
+        """A practice question by id, or None if it is not indexed"""
+        return self._questions.get(str(question_id))
+
+    def question_count(self):
+        return len(self._questions)
+
+    def remember_article(self, article):
+        with self._lock:
+            self._articles[str(article["id"])] = {c: article.get(c) for c in Article.summary_columns}
+
+    def _remove_question(self, question_id):
+        question = self._questions.pop(question_id, None)
+        if question is not None:
+            self._by_category.get(question.get("category"), {}).pop(question_id, None)
+
+    def apply_change(self, table, ids=(), rows=()):
+        """Patch the index after an admin write; rows are the written rows (empty on delete)"""
+        with self._lock:
+            self._generation += 1
+            if table == "articles":
+                for article_id in ids:
+                    self._articles.pop(str(article_id), None)
+                for row in rows:
+                    self._articles[str(row["id"])] = {c: row.get(c) for c in Article.summary_columns}
+            elif table == "practicequestions":
+                for question_id in ids:
+                    self._remove_question(str(question_id))
+                for row in rows:
+                    question_id = str(row["id"])
+                    row = dict(row)
+                    self._remove_question(question_id)
+                    self._questions[question_id] = row
+                    self._by_category.setdefault(row.get("category"), {})[question_id] = row
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "articles": len(self._articles),
+            "questions": len(self._questions),
+            "categories": len(self._by_category),
+        }
+
+
+content_index = content_loader.register(ContentIndex())
+
+
+@content_changed.connect
+def update_content_index(table, ids=(), rows=(), **kwargs):
+    content_index.apply_change(table, ids, rows)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+import api
+
+SECONDS_PER_DAY = 86400
+
+
+def streaks(days, today):
+    """Current and longest run of consecutive active days, from sorted unique day numbers"""
+    if len(days) == 0:
+        return 0, 0
+    # A new run starts wherever the gap to the previous active day is not exactly one day
+    starts = np.flatnonzero(np.diff(days, prepend=days[0] - 2) != 1)
+    lengths = np.diff(np.append(starts, len(days)))
+    current = int(lengths[-1]) if days[-1] >= today - 1 else 0
+    return current, int(lengths.max())
+
+
+def breakdown(codes, labels, mask):
+    """Count of events per label, for the events selected by `mask`"""
+    codes = codes[mask & (codes >= 0)]
+    counts = np.bincount(codes, minlength=len(labels))
+    return pd.Series(counts, index=labels, dtype="int64").loc[lambda s: s > 0].sort_values(ascending=False)
+
+
+def summarize(events, now=None):
+    """Aggregate columnar progress events (see /users/user/progress/events) with vectorized operations"""
+    completed_at = np.array(events["completed_at"], dtype="float64")  # None becomes NaN
+    is_question = np.array(events["is_question"], dtype=bool)
+    difficulty = np.array(events["difficulty"], dtype="int64")
+    category = np.array(events["category"], dtype="int64")
+
+    timed = ~np.isnan(completed_at)
+    day_numbers = (completed_at[timed] // SECONDS_PER_DAY).astype("int64")
+    active_days = np.unique(day_numbers)
+    today = int((now or pd.Timestamp.now(tz="UTC").timestamp()) // SECONDS_PER_DAY)
+    current_streak, longest_streak = streaks(active_days, today)
+
+    # Completions per calendar day (UTC), split into questions and articles, with gaps filled
+    daily = pd.DataFrame({
+        "day": pd.to_datetime(day_numbers * SECONDS_PER_DAY, unit="s"),
+        "Questions": is_question[timed].astype("int64"),
+        "Articles": (~is_question[timed]).astype("int64"),
+    }).groupby("day").sum()
+    if not daily.empty:
+        daily = daily.asfreq("D", fill_value=0)
+
+    return {
+        "daily": daily,
+        "cumulative": daily.cumsum(),
+        "by_difficulty": breakdown(difficulty, events["difficulties"], is_question),
+        "by_category": breakdown(category, events["categories"], np.ones_like(is_question)),
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+        "active_days": int(len(active_days)),
+        "events": int(events["count"]),
+    }
+
+
+@st.cache_data(ttl=api.CACHE_TTL, max_entries=api.CACHE_MAX_ENTRIES, show_spinner=False)
+def _progress_analytics(token, version):
+    # Only the aggregates are cached, not the raw events
+    return summarize(api.get_json("/users/user/progress/events", token))
+
+
+def progress_analytics(token):
+    """Aggregated analytics for the user, cached until the TTL expires or this session records progress"""
+    return _progress_analytics(token, api.data_version("progress"))
@@ -0,0 +1,161 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:5000")  # Base URL without /api
+CACHE_TTL = int(os.getenv("FRONTEND_CACHE_TTL", 60))  # Seconds a read is reused across reruns
+CACHE_MAX_ENTRIES = int(os.getenv("FRONTEND_CACHE_MAX_ENTRIES", 1000))
+POOL_SIZE = int(os.getenv("FRONTEND_POOL_SIZE", 32))  # Keep-alive connections to the backend
+FETCH_THREADS = int(os.getenv("FRONTEND_FETCH_THREADS", 8))  # Reads issued in parallel by prefetch()
+TIMEOUT = 10
+
+
+class APIError(Exception):
+    """Non-2xx response from the backend"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@st.cache_resource
+def get_session():
+    """One keep-alive connection pool shared by every browser session on this Streamlit server"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=POOL_SIZE,
+        # Only idempotent reads are retried, and only when the backend is restarting or busy
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=["GET"]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Content-Type"] = "application/json"
+    return session
+
+
+@st.cache_resource
+def get_executor():
+    """Thread pool shared by every browser session for parallel reads"""
+    return ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="api-fetch")
+
+
+def error_message(response):
+    try:
+        return response.json().get("error", "Unknown error occurred")
+    except ValueError:
+        return response.text
+
+
+def request(method, path, token=None, **kwargs):
+    """Send a request through the shared session and return the raw response"""
+    headers = kwargs.pop("headers", {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    kwargs.setdefault("timeout", TIMEOUT)
+    return get_session().request(method, f"{API_BASE_URL}{path}", headers=headers, **kwargs)
+
+
+def get_json(path, token, params=None):
+    response = request("GET", path, token, params=params)
+    if response.status_code != 200:
+        raise APIError(response.status_code, error_message(response))
+    return response.json()
+
+
+def post_json(path, token=None, json=None):
+    response = request("POST", path, token, json=json)
+    if response.status_code != 200:
+        raise APIError(response.status_code, error_message(response))
+    return response.json()
+
+
+# --- Cached reads ---
+# Entries are keyed on the token, so users never see each other's data. Each browser session
+# keeps a version number per group of reads; a write bumps it, which makes that session's
+# next read miss the cache without flushing anyone else's entries.
+
+def data_version(group):
+    return st.session_state.setdefault("api_versions", {}).get(group, 0)
+
+
+def invalidate(*groups):
+    """Make the next read of these groups go to the backend (call after a write)"""
+    versions = st.session_state.setdefault("api_versions", {})
+    for group in groups:
+        versions[group] = versions.get(group, 0) + 1
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_get(path, token, params, version):
+    return get_json(path, token, dict(params))
+
+
+def cached_get(group, path, token, params=None):
+    """GET through st.cache_data; errors are raised and never cached"""
+    return _cached_get(path, token, tuple(sorted((params or {}).items())), data_version(group))
+
+
+def get_articles_page(token, cursor=None, limit=20, view="summary"):
+    params = {"limit": limit, "view": view}
+    if cursor:
+        params["cursor"] = cursor
+    return cached_get("articles", "/users/articles", token, params)
+
+
+def get_article(token, article_id):
+    return cached_get("articles", f"/users/articles/{article_id}", token)
+
+
+def search(token, query, kind=None, limit=20):
+    params = {"q": query, "limit": limit}
+    if kind:
+        params["type"] = kind
+    return cached_get("articles", "/users/search", token, params)
+
+
+def get_progress_summary(token):
+    return cached_get("progress", "/users/user/progress/summary", token)
+
+
+def prefetch(*calls):
+    """Run independent cached reads in parallel and wait for all of them.
+
+    The results land in st.cache_data, so when the page later makes the same
+    calls they are cache hits and the rerun waits for the slowest read instead
+    of the sum of all of them. Errors are ignored here; the later call fetches
+    again and reports them where they are displayed.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        # Worker threads need the session's context to read st.session_state and the cache
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            call()
+        except Exception:
+            pass
+
+    for future in [get_executor().submit(run, call) for call in calls]:
+        future.result()
+
+
+# --- Writes ---
+
+def mark_progress(token, question_ids=(), article_ids=()):
+    """Mark questions/articles as read and refresh this session's progress reads"""
+    result = post_json("/users/progress/batch", token, {
+        "question_ids": list(question_ids),
+        "article_ids": list(article_ids),
+    })
+    invalidate("progress")
+    return result
+
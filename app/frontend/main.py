@@ -4,19 +4,24 @@ import json
 from PIL import Image
 import os
 from dotenv import load_dotenv
+import api
+import analytics
 
 load_dotenv()
 
-API_BASE_URL = "http://127.0.0.1:5000"  # Base URL without /api
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # Make sure this is set in your .env file
+ARTICLES_PAGE_SIZE = 20
+SEARCH_TYPES = {"All": None, "Articles": "article", "Questions": "question"}
 
 def init_session_state():
     if 'token' not in st.session_state:
         st.session_state.token = None
     if 'user_role' not in st.session_state:
         st.session_state.user_role = None
-    if 'completed_questions' not in st.session_state:
-        st.session_state.completed_questions = set()
+    if 'chat_messages' not in st.session_state:
+        st.session_state.chat_messages = []
+    if 'article_pages' not in st.session_state:
+        st.session_state.article_pages = 1
 
 def signup():
     st.subheader("Sign Up")
@@ -43,11 +48,7 @@ def signup():
                 data["admin_code"] = admin_code
 
             try:
-                response = requests.post(
-                    f"{API_BASE_URL}/users/signup",
-                    headers={"Content-Type": "application/json"},
-                    json=data
-                )
+                response = api.request("POST", "/users/signup", json=data)
                 
                 if response.status_code == 200:
                     st.success("Signup successful! Please check your email for verification.")
@@ -73,11 +74,9 @@ def login():
         
         if submit:
             try:
-                response = requests.post(
-                    f"{API_BASE_URL}/users/login",  # Fixed endpoint path
-                    headers={
-                        "Content-Type": "application/json"
-                    },
+                response = api.request(
+                    "POST",
+                    "/users/login",  # Fixed endpoint path
                     json={
                         "email": email,
                         "password": password
@@ -114,36 +113,43 @@ def display_articles():
         st.error("Please login first")
         return
         
-    headers = {
-        "Authorization": f"Bearer {st.session_state.token}",
-        "Content-Type": "application/json"
-    }
-    
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        query = st.text_input("🔍 Search", placeholder="Search articles and practice questions", key="search_query")
+    with col2:
+        kind = st.selectbox("Type", ["All", "Articles", "Questions"], key="search_type")
+
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/users/articles",
-            headers=headers,
-            timeout=10  # Add timeout
-        )
-        
-        if response.status_code == 200:
-            try:
-                articles = response.json()
-                if not articles:
-                    st.info("No articles available yet.")
-                else:
-                    for article in articles:
-                        with st.expander(f"📚 {article.get('title', 'Untitled')}"):
-                            st.markdown(article.get('content', 'No content available'))
-            except ValueError:
-                st.error("Invalid response format from server")
-        elif response.status_code == 401:
+        if query.strip():
+            display_search_results(query.strip(), SEARCH_TYPES[kind])
+            return
+
+        # Titles and categories only, one page at a time; earlier pages come from the cache
+        articles = []
+        cursor = None
+        for _ in range(st.session_state.article_pages):
+            page = api.get_articles_page(st.session_state.token, cursor, limit=ARTICLES_PAGE_SIZE)
+            articles.extend(page["articles"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        if not articles:
+            st.info("No articles available yet.")
+        else:
+            for article in articles:
+                display_article(article)
+
+        if cursor:
+            st.button("⬇️ Load more articles", on_click=load_more_articles)
+
+    except api.APIError as e:
+        if e.status_code in (401, 403):
             st.error("Session expired. Please login again")
             st.session_state.token = None
             st.rerun()
         else:
-            st.error(f"Error fetching articles: {response.text}")
-            
+            st.error(f"Error fetching articles: {str(e)}")
     except requests.exceptions.Timeout:
         st.error("⚠️ Request timed out. Please try again.")
     except requests.exceptions.ConnectionError:
@@ -151,33 +157,173 @@ def display_articles():
     except Exception as e:
         st.error(f"⚠️ Error: {str(e)}")
 
+def display_search_results(query, kind):
+    """Ranked matches from /users/search; articles open like in the full list"""
+    found = api.search(st.session_state.token, query, kind)
+    if not found["results"]:
+        st.info("No matches found.")
+        return
+
+    st.caption(f"{found['total']} match{'es' if found['total'] != 1 else ''}")
+    for result in found["results"]:
+        if result["type"] == "article":
+            display_article(result)
+        else:
+            difficulty = f" · {result['difficulty']}" if result.get("difficulty") else ""
+            st.markdown(f"🧩 [{result['title']}]({result['link']}) "
+                        f"<span class=\"category-tag\">{result.get('category') or 'general'}{difficulty}</span>",
+                        unsafe_allow_html=True)
+
+def load_more_articles():
+    st.session_state.article_pages += 1
+
+def display_article(article):
+    """Article expander whose content is only fetched once the user opens it"""
+    expander = st.expander(f"📚 {article.get('title', 'Untitled')}", key=f"article_open_{article['id']}", on_change="rerun")
+    with expander:
+        if article.get("category"):
+            st.markdown(f'<span class="category-tag">{article["category"]}</span>', unsafe_allow_html=True)
+        if not expander.open:
+            return
+        detail = api.get_article(st.session_state.token, article["id"])
+        st.markdown(detail.get('content') or 'No content available')
+        if st.button("✅ Mark as read", key=f"read_{article['id']}"):
+            api.mark_progress(st.session_state.token, article_ids=[article["id"]])
+            st.success("Marked as read")
+
+def prefetch_page_data():
+    """Fetch the reads the tabs and sidebar need concurrently, before rendering them"""
+    token = st.session_state.token
+    calls = [
+        lambda: api.get_articles_page(token, limit=ARTICLES_PAGE_SIZE),
+        lambda: api.get_progress_summary(token),
+        lambda: analytics.progress_analytics(token),
+    ]
+    # Articles the user has open
+    for key, is_open in st.session_state.items():
+        if key.startswith("article_open_") and is_open:
+            article_id = key[len("article_open_"):]
+            calls.append(lambda article_id=article_id: api.get_article(token, article_id))
+    api.prefetch(*calls)
+
+def fetch_progress_summary():
+    """Get the server-side progress summary, or None if it cannot be fetched"""
+    try:
+        return api.get_progress_summary(st.session_state.token)
+    except (api.APIError, requests.exceptions.RequestException):
+        return None
+
 def display_progress():
     st.header("📊 Learning Analytics")
     
     if 'token' not in st.session_state:
         st.error("Please login first")
         return
-        
-    headers = {
-        "Authorization": f"Bearer {st.session_state.token}",
-        "apikey": SUPABASE_KEY,
-        "Content-Type": "application/json"
-    }
-    
+
+    summary = fetch_progress_summary()
+    if summary is None:
+        st.error("Error fetching progress. Please try again.")
+        return
+
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/users/user/progress",
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            progress_data = response.json()
-            st.write("Your Learning Progress:", progress_data)
+        stats = analytics.progress_analytics(st.session_state.token)
+    except (api.APIError, requests.exceptions.RequestException):
+        st.error("Error fetching progress history. Please try again.")
+        return
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Questions Completed", f"{summary['completed_questions']} / {summary['total_questions']}")
+    col2.metric("Completion", f"{summary['completion_percent']:.1f}%")
+    col3.metric("Articles Read", summary["completed_articles"])
+    col4.metric("Current Streak", f"{stats['current_streak']} days")
+    col5.metric("Longest Streak", f"{stats['longest_streak']} days", help=f"{stats['active_days']} active days")
+
+    if stats["daily"].empty:
+        st.info("No activity yet. Mark articles or questions as read to see your progress over time.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Completion Over Time")
+            st.line_chart(stats["cumulative"])
+        with col2:
+            st.subheader("Daily Activity (last 90 days)")
+            st.bar_chart(stats["daily"].tail(90))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("By Difficulty")
+        if not stats["by_difficulty"].empty:
+            st.bar_chart(stats["by_difficulty"])
         else:
-            st.error(f"Error: {response.status_code} - {response.text}")
-            
-    except Exception as e:
-        st.error(f"Error fetching progress: {str(e)}")
+            st.info("No questions completed yet.")
+    with col2:
+        st.subheader("By Category")
+        if not stats["by_category"].empty:
+            st.bar_chart(stats["by_category"])
+        else:
+            st.info("Nothing completed yet.")
+
+    st.subheader("Recent Activity")
+    if summary["recent_activity"]:
+        st.dataframe(summary["recent_activity"], use_container_width=True)
+    else:
+        st.info("No activity yet.")
+
+def stream_chat_response(query):
+    """Yield response tokens from the /chat/stream Server-Sent Events endpoint"""
+    with api.request(
+        "POST",
+        "/chat/stream",
+        st.session_state.token,
+        json={"user_query": query},
+        stream=True,
+        timeout=(5, 120)  # Connect quickly, but allow long generations
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                event = None
+                continue
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                payload = json.loads(line[len("data:"):])
+                if event == "error":
+                    raise RuntimeError(payload.get("error", "Unknown error occurred"))
+                if event is None and "delta" in payload:
+                    yield payload["delta"]
+
+def display_chat():
+    st.header("🤖 AI Tutor")
+
+    if 'token' not in st.session_state or not st.session_state.token:
+        st.error("Please login first")
+        return
+
+    for message in st.session_state.chat_messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    query = st.chat_input("Ask a DSA question...")
+    if not query:
+        return
+
+    st.session_state.chat_messages.append({"role": "user", "content": query})
+    with st.chat_message("user"):
+        st.markdown(query)
+
+    with st.chat_message("assistant"):
+        try:
+            # Render tokens as they arrive instead of waiting for the full answer
+            answer = st.write_stream(stream_chat_response(query))
+            st.session_state.chat_messages.append({"role": "assistant", "content": answer})
+        except requests.exceptions.ConnectionError:
+            st.error("⚠️ Unable to connect to server. Please check your internet connection.")
+        except Exception as e:
+            st.error(f"⚠️ Error: {str(e)}")
 
 def main():
     # Configure page with dark theme and wide layout
@@ -436,6 +582,8 @@ def main():
             </div>
         """, unsafe_allow_html=True)
 
+        prefetch_page_data()
+
         # Sidebar with user info and stats
         with st.sidebar:
             st.markdown("""
@@ -449,12 +597,12 @@ def main():
             
             # Add quick stats in sidebar
             st.markdown("### 📊 Quick Stats")
+            summary = fetch_progress_summary() or {"completed_questions": 0, "completion_percent": 0.0}
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Questions", len(st.session_state.completed_questions))
+                st.metric("Questions", summary["completed_questions"])
             with col2:
-                progress_percent = len(st.session_state.completed_questions) * 100 / 50  # Assuming 50 total questions
-                st.metric("Progress", f"{progress_percent:.1f}%")
+                st.metric("Progress", f"{summary['completion_percent']:.1f}%")
             
             if st.button("🚪 Logout", type="primary"):
                 for key in st.session_state.keys():
@@ -462,11 +610,13 @@ def main():
                 st.rerun()
 
         # Main content area
-        tab1, tab2 = st.tabs(["📚 Learning Hub", "📈 Progress Analytics"])
+        tab1, tab2, tab3 = st.tabs(["📚 Learning Hub", "📈 Progress Analytics", "🤖 AI Tutor"])
         with tab1:
             display_articles()
         with tab2:
             display_progress()
+        with tab3:
+            display_chat()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,217 @@
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import httpx
+from app.metrics import current_route, record_span, record_tokens, span
+
+
+def retryable_errors():
+    """Failures worth retrying: the request never reached the model or the provider is overloaded"""
+    import openai
+    return (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+
+class LLMBusyError(Exception):
+    """Raised when the LLM gateway cannot take another call; callers should answer 503"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMStream:
+    """An open streaming completion that holds a concurrency slot until closed"""
+
+    def __init__(self, gateway, stream, started=None):
+        self._gateway = gateway
+        self._stream = stream
+        self._closed = False
+        # The body is streamed after the request has returned, so keep the route for the metrics
+        self._route = current_route()
+        self._started = started or time.perf_counter()
+        self._usage = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                if getattr(chunk, "usage", None):
+                    self._usage = chunk.usage
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._stream.close()
+        finally:
+            self._gateway._release()
+            record_span("llm", "stream", time.perf_counter() - self._started, route=self._route)
+            record_tokens(self._usage, route=self._route)
+
+
+def retry_delay(attempt):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(0.5 * 2 ** attempt, 8))
+
+
+class LLMGateway:
+    """OpenAI-compatible client with a concurrency limit, bounded wait queue, timeouts and retries.
+
+    At most `max_concurrency` calls run at once. Up to `max_queue` more may
+    wait `queue_timeout` seconds for a slot; anything beyond that is
+    rejected immediately with LLMBusyError so request threads are not tied
+    up waiting on the provider.
+    """
+
+    def __init__(self, api_key, base_url, max_concurrency=16, max_queue=64, queue_timeout=10.0,
+                 timeout=60.0, connect_timeout=5.0, max_retries=2, pool_size=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        pool_size = pool_size or max_concurrency
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        )
+        from openai import OpenAI  # Slow to import, so loaded with the first gateway rather than at boot
+
+        # Retries are done here (with jitter and metrics), not inside the SDK
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+        )
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1000)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _acquire(self):
+        """Take a concurrency slot, waiting in the bounded queue if necessary"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise LLMBusyError("LLM queue is full")
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+
+            started = time.monotonic()
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            waited = time.monotonic() - started
+
+            if not acquired:
+                with self._lock:
+                    self.rejected += 1
+                    self._waits.append(waited)
+                raise LLMBusyError("Timed out waiting for an LLM slot", retry_after=max(1, int(self.queue_timeout)))
+        else:
+            waited = 0.0
+
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+            self._waits.append(waited)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _call_with_retries(self, call):
+        """Run `call`, retrying retryable failures with full-jitter exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call()
+            except retryable_errors() as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.errors += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                print(f"⚠️ LLM call failed ({type(e).__name__}), retrying:", str(e))
+                time.sleep(retry_delay(attempt))
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+
+    def chat_completion(self, **kwargs):
+        """Blocking chat completion"""
+        with span("llm", "chat_completion"), self.slot():
+            response = self._call_with_retries(lambda: self.client.chat.completions.create(**kwargs))
+        record_tokens(response.usage)
+        return response
+
+    def open_stream(self, **kwargs):
+        """Start a streaming chat completion; the slot is released when the stream is closed"""
+        started = time.perf_counter()
+        self._acquire()
+        try:
+            # The final chunk then carries token usage (with no choices)
+            stream = self._call_with_retries(lambda: self.client.chat.completions.create(
+                stream=True, stream_options={"include_usage": True}, **kwargs
+            ))
+        except Exception:
+            self._release()
+            record_span("llm", "stream", time.perf_counter() - started, error=True)
+            raise
+        return LLMStream(self, stream, started)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "errors": self.errors,
+            "wait_seconds_p50": percentile(0.50),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": round(waits[-1], 4) if waits else 0.0,
+        }
@@ -0,0 +1,408 @@
+# Request timing. Each request collects spans (auth, Supabase calls, LLM calls) in a
+# context variable; they are aggregated into per-route histograms and served in the
+# Prometheus text format at /metrics. With several worker processes, METRICS_DIR
+# lets every worker report the totals of all of them (see SharedMetrics).
+import contextvars
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, request, jsonify
+from config import METRICS_ENABLED, METRICS_TOKEN, METRICS_DIR, METRICS_SYNC_INTERVAL
+
+# Upper bounds in seconds; covers cache hits (~1 ms) up to slow LLM answers
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Route label for work done outside a request (write-behind flushes, index rebuilds)
+NO_ROUTE = "background"
+
+# Spans recorded by the current request: {"route": ..., "spans": {kind: [seconds, calls]}}
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def state(self):
+        """Copy of the values: {label values: value}"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(state, other):
+        for label_values, value in other.items():
+            state[label_values] = state.get(label_values, 0) + value
+
+    def samples(self, state):
+        for label_values, value in sorted(state.items()):
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, as Prometheus expects"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def state(self):
+        """Copy of the series: {label values: [bucket counts..., +Inf count, sum]}"""
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    @staticmethod
+    def merge(state, other):
+        for label_values, series in other.items():
+            if label_values in state:
+                state[label_values] = [a + b for a, b in zip(state[label_values], series)]
+            else:
+                state[label_values] = list(series)
+
+    def samples(self, state):
+        names = self.labels + ("le",)
+        for label_values, series in sorted(state.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(names, label_values + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, label_values)} {series[-1]:.6f}"
+            yield f"{self.name}_count{format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """This process's values as JSON-serializable data"""
+        return {
+            metric.name: [[list(label_values), value] for label_values, value in metric.state().items()]
+            for metric in self._metrics
+        }
+
+    def render(self, snapshots=None):
+        """All metrics in the Prometheus text exposition format: this process's, or the sum of `snapshots`"""
+        lines = []
+        for metric in self._metrics:
+            state = metric.state() if snapshots is None else {}
+            for snapshot in snapshots or ():
+                metric.merge(state, {tuple(k): v for k, v in snapshot.get(metric.name, [])})
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples(state))
+        return "\n".join(lines) + "\n"
+
+
+class SharedMetrics:
+    """Sums the metrics of every worker process through files in a shared directory.
+
+    Each worker writes a snapshot of its own values to <pid>.json every
+    `interval` seconds, and /metrics sums the latest snapshot of every worker
+    (after refreshing its own), so whichever worker answers a scrape reports
+    the same totals. A worker that exits folds its final values into archived.json,
+    which keeps the totals from going backwards when workers are recycled.
+    """
+
+    ARCHIVE = "archived.json"
+
+    def __init__(self, directory, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self, exclusive):
+        # Serializes archiving with readers, across processes. Only used under gunicorn,
+        # so the Unix-only module is not imported on other platforms
+        import fcntl
+
+        with open(self._path(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, name, data):
+        temporary = self._path(f".{name}.{os.getpid()}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(data, f)
+        os.replace(temporary, self._path(name))
+
+    def _read(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _own(self):
+        return f"{os.getpid()}.json"
+
+    def _archive(self, snapshot):
+        """Add a snapshot to archived.json (caller holds the exclusive lock)"""
+        archived = self._read(self.ARCHIVE) or {}
+        merged = {}
+        for metric in registry._metrics:
+            state = {}
+            for data in (archived, snapshot):
+                metric.merge(state, {tuple(k): v for k, v in data.get(metric.name, [])})
+            merged[metric.name] = [[list(k), v] for k, v in state.items()]
+        self._write(self.ARCHIVE, merged)
+
+    def ensure_started(self):
+        """Start this process's snapshot writer (once per process, so again after fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with self._locked(exclusive=True):
+                # Left by a killed worker whose pid this process reuses
+                stale = self._read(self._own())
+                if stale:
+                    self._archive(stale)
+                    os.remove(self._path(self._own()))
+            self._pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                with self._lock:
+                    if self._pid != os.getpid():
+                        return
+                    try:
+                        self._write(self._own(), registry.snapshot())
+                    except OSError as e:
+                        print("⚠️ Could not write metrics snapshot:", str(e))
+
+        threading.Thread(target=run, name="metrics-sync", daemon=True).start()
+
+    def collect(self):
+        """Snapshots of every worker, live and retired, with this one's brought up to date"""
+        self.ensure_started()
+        with self._lock:
+            self._write(self._own(), registry.snapshot())
+        with self._locked(exclusive=False):
+            names = [n for n in os.listdir(self.directory) if n.endswith(".json")]
+            return [s for s in map(self._read, names) if s]
+
+    def retire(self):
+        """Fold this process's final values into the archive and remove its snapshot"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._pid = None  # Stops the writer
+            with self._locked(exclusive=True):
+                self._archive(registry.snapshot())
+                try:
+                    os.remove(self._path(self._own()))
+                except FileNotFoundError:
+                    pass
+
+
+registry = Registry()
+
+# Set by gunicorn.conf.py when it runs several workers
+shared = SharedMetrics(METRICS_DIR, METRICS_SYNC_INTERVAL) if METRICS_DIR else None
+
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to produce the response (streamed bodies excluded)",
+    labels=("method", "route", "status"),
+))
+request_breakdown = registry.register(Histogram(
+    "http_request_span_seconds", "Time each request spent in auth, Supabase and LLM calls",
+    labels=("route", "kind"),
+))
+span_duration = registry.register(Histogram(
+    "span_duration_seconds", "Duration of individual auth, Supabase and LLM calls",
+    labels=("route", "kind", "operation"),
+))
+span_errors = registry.register(Counter(
+    "span_errors_total", "Auth, Supabase and LLM calls that raised or returned an error status",
+    labels=("route", "kind", "operation"),
+))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "Tokens sent to (prompt) and received from (completion) the LLM",
+    labels=("route", "direction"),
+))
+
+
+def current_route():
+    timing = _current.get()
+    return timing["route"] if timing else NO_ROUTE
+
+
+def record_span(kind, operation, seconds, error=False, route=None):
+    """Add a finished span to the histograms and to the current request's breakdown"""
+    timing = _current.get()
+    route = route or (timing["route"] if timing else NO_ROUTE)
+    span_duration.observe(seconds, route, kind, operation)
+    if error:
+        span_errors.inc(route, kind, operation)
+    if timing is not None and timing["route"] == route:
+        totals = timing["spans"].setdefault(kind, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+@contextmanager
+def span(kind, operation):
+    """Time the enclosed block as one `kind` span (auth, supabase, llm)"""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_span(kind, operation, time.perf_counter() - started, error)
+
+
+def record_tokens(usage, route=None):
+    """Count prompt/completion tokens from an OpenAI-style `usage` object"""
+    if usage is None:
+        return
+    route = route or current_route()
+    llm_tokens.inc(route, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    llm_tokens.inc(route, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+
+# --- Supabase (httpx event hooks on the shared client) ---
+
+def supabase_operation(http_request):
+    """Low-cardinality name for a Supabase call, e.g. "GET articles" or "auth user" """
+    path = http_request.url.path
+    for prefix, kind in (("/rest/v1/", None), ("/auth/v1/", "auth"), ("/storage/v1/", "storage")):
+        if path.startswith(prefix):
+            resource = path[len(prefix):].split("/")[0] or "-"
+            return f"{kind} {resource}" if kind else f"{http_request.method} {resource}"
+    return http_request.method
+
+
+def _start_timer(http_request):
+    http_request.extensions["started"] = time.perf_counter()
+
+
+def _stop_timer(response):
+    started = response.request.extensions.get("started")
+    if started is not None:
+        record_span("supabase", supabase_operation(response.request), time.perf_counter() - started,
+                    error=response.status_code >= 500)
+
+
+def httpx_hooks():
+    """event_hooks for an httpx.Client that record every call as a supabase span"""
+    return {"request": [_start_timer], "response": [_stop_timer]}
+
+
+# --- Flask ---
+
+def route_label():
+    # The URL rule, not the path, so /users/articles/<id> is one series
+    return request.url_rule.rule if request.url_rule else "<unmatched>"
+
+
+def start_request():
+    if shared is not None:
+        shared.ensure_started()
+    g.request_timing_token = _current.set({"route": route_label(), "spans": {}})
+    g.request_started = time.perf_counter()
+
+
+def finish_request(response):
+    timing = _current.get()
+    started = g.pop("request_started", None)
+    if timing is None or started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    request_duration.observe(elapsed, request.method, timing["route"], str(response.status_code))
+    parts = []
+    for kind, (seconds, calls) in sorted(timing["spans"].items()):
+        request_breakdown.observe(seconds, timing["route"], kind)
+        parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"')
+    parts.append(f"total;dur={elapsed * 1000:.1f}")
+    # Per-request breakdown, shown in the browser devtools' timing tab
+    response.headers["Server-Timing"] = ", ".join(parts)
+    return response
+
+
+def end_request(exc=None):
+    token = g.pop("request_timing_token", None)
+    if token is not None:
+        _current.reset(token)
+
+
+def metrics_view():
+    """Prometheus scrape endpoint, only served with METRICS_TOKEN"""
+    if not METRICS_TOKEN:
+        return jsonify({"error": "Metrics are disabled: set METRICS_TOKEN to enable /metrics"}), 403
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return jsonify({"error": "Unauthorized"}), 401
+    snapshots = shared.collect() if shared is not None else None
+    return Response(registry.render(snapshots), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Time every request and serve /metrics"""
+    if not METRICS_ENABLED:
+        return
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -6,11 +6,25 @@ class User:
 class Article:
     table_name = "articles"
     columns = ["id", "title", "content", "category", "image_url", "gif_url", "created_at", "updated_at"]
+    required = ["title", "content"]
+    summary_columns = ["id", "title", "category"]  # Projection used by paginated listings
 
 class PracticeQuestion:
-    table_name = "practice_questions"
-    columns = ["id", "title", "link", "difficulty", "created_at", "updated_at"]
+    table_name = "practicequestions"
+    columns = ["id", "title", "link", "difficulty", "category", "created_at", "updated_at"]
+    required = ["title", "link", "difficulty"]
 
 class UserProgress:
     table_name = "user_progress"
-    columns = ["id", "user_id", "article_id", "question_id", "completed_at"]
\ No newline at end of file
+    columns = ["id", "user_id", "article_id", "question_id", "completed_at"]
+
+def validate_row(model, row):
+    """Return the problems with a row for `model` (an empty list when it is valid)"""
+    if not isinstance(row, dict):
+        return ["Row must be a JSON object"]
+
+    errors = [f"Missing required field '{field}'" for field in model.required if not row.get(field)]
+    unknown = sorted(set(row) - set(model.columns))
+    if unknown:
+        errors.append(f"Unknown fields: {', '.join(unknown)}")
+    return errors
@@ -1,17 +1,31 @@
 from flask import Blueprint, request, jsonify
-from app import create_app
+from middlewares.auth import token_required, is_admin
+from app.services import get_supabase
+from app.progress.summary import record_progress
+from app.users.routes import mark_progress
 
 progress = Blueprint('progress', __name__)
 
 @progress.route('/progress', methods=['POST'])
-def track_progress():
-    app = create_app()
-    data = request.get_json()
-    response = app.supabase.table("user_progress").insert(data).execute()
-    return jsonify(response.data)
+@token_required
+def track_progress(user):
+    """Mark one question or article as completed for the logged-in user"""
+    data = request.get_json(silent=True) or {}
+    items = [(column, data[column]) for column in ("question_id", "article_id") if data.get(column) is not None]
+    if len(items) != 1:
+        return jsonify({"error": "Provide exactly one of question_id or article_id"}), 400
+
+    # Idempotent like /users/questions/<id>/mark-read: a repeat adds no row and returns []
+    column, item_id = items[0]
+    created = mark_progress(user["id"], column, [str(item_id)])
+    record_progress(user["id"], created)
+    return jsonify(created)
 
-@progress.route('/progress/<int:user_id>', methods=['GET'])
-def get_progress(user_id):
-    app = create_app()
-    response = app.supabase.table("user_progress").select("*").eq("user_id", user_id).execute()
-    return jsonify(response.data)
\ No newline at end of file
+@progress.route('/progress/<string:user_id>', methods=['GET'])
+@token_required
+def get_progress(user, user_id):
+    """Users can read their own progress rows, admins anyone's"""
+    if user_id != user["id"] and not is_admin(user):
+        return jsonify({"error": "Unauthorized"}), 403
+    response = get_supabase().table("userprogress").select("*").eq("user_id", user_id).execute()
+    return jsonify(response.data)
@@ -0,0 +1,142 @@
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from app.services import get_supabase
+from app.cache import TTLCache
+from app.content_index import content_index, fetch_all
+from config import PROGRESS_SUMMARY_TTL, PROGRESS_SUMMARY_SIZE
+
+RECENT_ACTIVITY = 10
+
+
+def total_question_count():
+    """Number of practice questions, from the content index when it is loaded"""
+    if content_index.loaded:
+        return content_index.question_count()
+    return get_supabase().table("practicequestions").select("id", count="exact", head=True).execute().count or 0
+
+
+class ProgressSummary:
+    """Running progress counters for one user"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.question_ids = set()
+        self.article_ids = set()
+        self.by_difficulty = Counter()
+        self.by_category = Counter()
+        self.recent = deque(maxlen=RECENT_ACTIVITY)
+
+    def add(self, row):
+        """Count a userprogress row once; later repeats of the same item are ignored"""
+        question_id = row.get("question_id")
+        article_id = row.get("article_id")
+
+        if question_id is not None and str(question_id) not in self.question_ids:
+            self.question_ids.add(str(question_id))
+            question = content_index.question(question_id) or {}
+            self.by_difficulty[question.get("difficulty") or "unknown"] += 1
+            self.by_category[question.get("category") or "uncategorized"] += 1
+        elif article_id is not None and str(article_id) not in self.article_ids:
+            self.article_ids.add(str(article_id))
+        else:
+            return
+
+        self.recent.appendleft({
+            "question_id": question_id,
+            "article_id": article_id,
+            "completed_at": row.get("completed_at"),
+        })
+
+    def as_dict(self, total_questions):
+        completed = len(self.question_ids)
+        return {
+            "completed_questions": completed,
+            "completed_articles": len(self.article_ids),
+            "total_questions": total_questions,
+            "completion_percent": round(completed * 100 / total_questions, 1) if total_questions else 0.0,
+            "by_difficulty": dict(self.by_difficulty),
+            "by_category": dict(self.by_category),
+            "recent_activity": list(self.recent),
+        }
+
+
+# user_id -> ProgressSummary, built once from userprogress and then updated in place
+summaries = TTLCache(maxsize=PROGRESS_SUMMARY_SIZE, ttl=PROGRESS_SUMMARY_TTL)
+
+
+def load_summary(user_id):
+    """Build a user's counters from their progress rows (projected, paged past PostgREST's row limit)"""
+    rows = fetch_all("userprogress", "id,question_id,article_id,completed_at", user_id=user_id)
+
+    summary = ProgressSummary()
+    for row in sorted(rows, key=lambda r: r.get("completed_at") or ""):
+        summary.add(row)
+    return summary
+
+
+def get_summary(user_id):
+    summary = summaries.get(user_id)
+    if summary is None:
+        index_loaded = content_index.loaded
+        summary = load_summary(user_id)
+        if index_loaded:
+            # Built while the index was cold, difficulties and categories fell back to
+            # "unknown"; such a summary is served once and rebuilt on the next read
+            summaries.set(user_id, summary)
+
+    with summary.lock:
+        return summary.as_dict(total_question_count())
+
+
+def record_progress(user_id, rows):
+    """Apply newly created progress rows to the user's cached counters, if any"""
+    summary = summaries.get(user_id)
+    if summary is None:
+        return  # Built from the table on the next read
+    with summary.lock:
+        for row in sorted(rows, key=lambda r: r.get("completed_at") or ""):
+            summary.add(row)
+
+
+def timestamp(value):
+    """Epoch seconds for a Supabase timestamp string, or None"""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+def progress_events(user_id):
+    """A user's progress rows as parallel columns, oldest first.
+
+    Difficulty and category are small integer codes into the `difficulties`
+    and `categories` lists (-1 when unknown), which keeps the payload compact
+    for users with tens of thousands of rows and maps straight onto arrays.
+    """
+    rows = fetch_all("userprogress", "id,question_id,article_id,completed_at", user_id=user_id)
+    rows.sort(key=lambda r: r.get("completed_at") or "")
+
+    difficulties = {}
+    categories = {}
+    completed_at, is_question, difficulty, category = [], [], [], []
+    for row in rows:
+        if row.get("question_id") is not None:
+            item = content_index.question(row["question_id"]) or {}
+            is_question.append(1)
+            difficulty.append(difficulties.setdefault(item["difficulty"], len(difficulties)) if item.get("difficulty") else -1)
+        else:
+            item = content_index.article(row.get("article_id")) or {}
+            is_question.append(0)
+            difficulty.append(-1)
+        category.append(categories.setdefault(item["category"], len(categories)) if item.get("category") else -1)
+        completed_at.append(timestamp(row.get("completed_at")))
+
+    return {
+        "count": len(rows),
+        "completed_at": completed_at,
+        "is_question": is_question,
+        "difficulty": difficulty,
+        "category": category,
+        "difficulties": list(difficulties),
+        "categories": list(categories),
+    }
@@ -0,0 +1,205 @@
+import bisect
+import heapq
+import math
+import re
+from collections import Counter
+from app.content_index import BackgroundIndex, content_loader
+from app.signals import content_changed
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when where which with".split()
+)
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+TITLE_WEIGHT = 3  # A title word counts as this many body words
+PREFIX_WEIGHT = 0.6  # Score multiplier for words that only start with the query term
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50  # Most frequent completions used per query term
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def article_document(row):
+    return {
+        "type": "article",
+        "id": row["id"],
+        "title": row.get("title"),
+        "category": row.get("category"),
+        "terms": Counter(
+            tokenize(row.get("title")) * TITLE_WEIGHT + tokenize(row.get("category")) + tokenize(row.get("content"))
+        ),
+    }
+
+
+def question_document(row):
+    return {
+        "type": "question",
+        "id": row["id"],
+        "title": row.get("title"),
+        "category": row.get("category"),
+        "difficulty": row.get("difficulty"),
+        "link": row.get("link"),
+        "terms": Counter(tokenize(row.get("title")) * TITLE_WEIGHT + tokenize(row.get("category"))),
+    }
+
+
+class SearchIndex(BackgroundIndex):
+    """BM25 inverted index over article and practice question text"""
+
+    def __init__(self):
+        super().__init__()
+        self._documents = {}  # (type, id) -> document
+        self._postings = {}  # term -> {(type, id): term frequency}
+        self._vocabulary = []  # Sorted terms, for prefix lookups
+        self._total_length = 0
+
+    def load(self, articles, questions):
+        documents = {}
+        for document in map(article_document, articles):
+            documents[("article", str(document["id"]))] = document
+        for document in map(question_document, questions):
+            documents[("question", str(document["id"]))] = document
+
+        postings = {}
+        total_length = 0
+        for key, document in documents.items():
+            document["length"] = sum(document["terms"].values())
+            total_length += document["length"]
+            for term, frequency in document["terms"].items():
+                postings.setdefault(term, {})[key] = frequency
+
+        with self._lock:
+            self._documents = documents
+            self._postings = postings
+            self._vocabulary = sorted(postings)
+            self._total_length = total_length
+
+    # --- Incremental updates (caller holds the lock) ---
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        self._total_length -= document["length"]
+        for term in document["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+
+    def _add(self, key, document):
+        self._remove(key)
+        document["length"] = sum(document["terms"].values())
+        self._documents[key] = document
+        self._total_length += document["length"]
+        for term, frequency in document["terms"].items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            self._postings[term][key] = frequency
+
+    def apply_change(self, table, ids=(), rows=()):
+        """Patch the index after an admin write; rows are the written rows (empty on delete)"""
+        if table == "articles":
+            kind, make_document = "article", article_document
+        elif table == "practicequestions":
+            kind, make_document = "question", question_document
+        else:
+            return
+
+        with self._lock:
+            self._generation += 1
+            for row_id in ids:
+                self._remove((kind, str(row_id)))
+            for row in rows:
+                self._add((kind, str(row["id"])), make_document(row))
+
+    # --- Queries ---
+
+    def _expand(self, term):
+        """Index terms matching a query term: (term, weight) for the exact term and its prefix completions"""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) < MIN_PREFIX_LENGTH:
+            return matches
+
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + "\uffff", start)
+        completions = [t for t in self._vocabulary[start:end] if t != term]
+        if len(completions) > MAX_PREFIX_EXPANSIONS:
+            completions = heapq.nlargest(MAX_PREFIX_EXPANSIONS, completions, key=lambda t: len(self._postings[t]))
+        return matches + [(t, PREFIX_WEIGHT) for t in completions]
+
+    def search(self, query, limit=20, kind=None, category=None, difficulty=None):
+        """Top `limit` documents for `query` by BM25, as (total matches, results); None while not loaded"""
+        self._check_fresh()
+        if not self.loaded:
+            return None
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        category = category.lower() if category else None
+        difficulty = difficulty.lower() if difficulty else None
+
+        def allowed(document):
+            if kind and document["type"] != kind:
+                return False
+            if category and (document.get("category") or "").lower() != category:
+                return False
+            if difficulty and (document.get("difficulty") or "").lower() != difficulty:
+                return False
+            return True
+
+        with self._lock:
+            count = len(self._documents)
+            if not count or not terms:
+                return 0, []
+            average_length = self._total_length / count
+
+            scores = {}
+            rejected = set()
+            for query_term in terms:
+                for term, weight in self._expand(query_term):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, frequency in postings.items():
+                        if key in rejected:
+                            continue
+                        document = self._documents[key]
+                        if key not in scores and not allowed(document):
+                            rejected.add(key)
+                            continue
+                        norm = K1 * (1 - B + B * document["length"] / average_length)
+                        scores[key] = scores.get(key, 0.0) + weight * idf * frequency * (K1 + 1) / (frequency + norm)
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            results = [
+                {**{k: v for k, v in self._documents[key].items() if k not in ("terms", "length")},
+                 "score": round(score, 4)}
+                for key, score in top
+            ]
+        return len(scores), results
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "documents": len(self._documents),
+            "terms": len(self._postings),
+        }
+
+
+search_index = content_loader.register(SearchIndex())
+
+
+@content_changed.connect
+def update_search_index(table, ids=(), rows=(), **kwargs):
+    search_index.apply_change(table, ids, rows)
@@ -0,0 +1,158 @@
+# Clients for external services, created on first use and reused by every request.
+# Routes and helpers call get_supabase() / get_llm() instead of importing globals,
+# so tests can swap in fakes (create_app(services=...) or services.override(...)).
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+import httpx
+from flask import current_app, has_app_context
+from app.llm import LLMGateway
+from app.metrics import httpx_hooks
+from config import (
+    SUPABASE_URL, SUPABASE_KEY, SUPABASE_POOL_SIZE, SUPABASE_TIMEOUT,
+    DEEPSEEK_API_KEY, DEEPSEEK_API_URL,
+    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT,
+    LLM_MAX_RETRIES, LLM_POOL_SIZE,
+)
+
+LLM_OPTIONS = {
+    "api_key": DEEPSEEK_API_KEY,
+    "base_url": DEEPSEEK_API_URL,
+    "max_concurrency": LLM_MAX_CONCURRENCY,
+    "max_queue": LLM_MAX_QUEUE,
+    "queue_timeout": LLM_QUEUE_TIMEOUT,
+    "timeout": LLM_TIMEOUT,
+    "connect_timeout": LLM_CONNECT_TIMEOUT,
+    "max_retries": LLM_MAX_RETRIES,
+    "pool_size": LLM_POOL_SIZE,
+}
+
+
+def create_supabase():
+    """Supabase client whose database and auth calls share one keep-alive connection pool"""
+    # Imported on first use: supabase pulls in several SDKs and is slow to load
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    http_client = httpx.Client(
+        timeout=SUPABASE_TIMEOUT,
+        limits=httpx.Limits(max_connections=SUPABASE_POOL_SIZE, max_keepalive_connections=SUPABASE_POOL_SIZE),
+        follow_redirects=True,
+        event_hooks=httpx_hooks(),  # Time every database/auth call (see app/metrics.py)
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=SyncClientOptions(httpx_client=http_client))
+
+
+def create_llm():
+    """OpenAI-compatible DeepSeek client with concurrency control"""
+    return LLMGateway(**LLM_OPTIONS)
+
+
+class Services:
+    """Registry of lazily created clients, one instance of each per worker process.
+
+    Connection pools must not be shared across fork(), so instances created
+    before a fork are dropped and rebuilt on first use in the child. Overrides
+    (e.g. fakes in tests) are kept as they are.
+    """
+
+    def __init__(self, factories=None):
+        self._factories = dict(factories or {})
+        self._instances = {}
+        self._overrides = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        """Return the client registered under `name`, creating it on first use"""
+        if name in self._overrides:
+            return self._overrides[name]
+        if self._pid == os.getpid() and name in self._instances:
+            return self._instances[name]
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._instances.clear()
+                self._pid = os.getpid()
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No service registered as {name!r}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def override(self, name, instance):
+        """Use `instance` for `name` instead of the factory (pass None to undo)"""
+        with self._lock:
+            if instance is None:
+                self._overrides.pop(name, None)
+            else:
+                self._overrides[name] = instance
+
+    def warm(self, background=True):
+        """Create every registered client (in a background thread by default), so the first request does not pay for it"""
+        def run():
+            for name in list(self._factories):
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"🚨 Could not create the {name} client:", str(e))
+
+        if background:
+            threading.Thread(target=run, name="services-warm", daemon=True).start()
+        else:
+            run()
+
+    def reset(self):
+        """Drop every created client; the next get() builds fresh ones"""
+        with self._lock:
+            self._instances.clear()
+            self._pid = os.getpid()
+
+
+# Process-wide registry, used by create_app() by default
+services = Services({"supabase": create_supabase, "llm": create_llm})
+
+# Registry for work running outside a request, set by using_services()
+_active = contextvars.ContextVar("services", default=None)
+
+
+def current_services():
+    """The current app's registry inside a request or app context, else the one bound to
+    this background job (see bind_services), else the process default"""
+    if has_app_context():
+        return current_app.extensions.get("services", services)
+    return _active.get() or services
+
+
+@contextmanager
+def using_services(registry):
+    """Make get_supabase()/get_llm() use `registry` inside the block"""
+    token = _active.set(registry)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def bind_services(function):
+    """Wrap `function` to run with the caller's registry, for work handed to another thread"""
+    registry = current_services()
+
+    def run(*args, **kwargs):
+        with using_services(registry):
+            return function(*args, **kwargs)
+    return run
+
+
+def get_supabase():
+    return current_services().get("supabase")
+
+
+def get_llm():
+    return current_services().get("llm")
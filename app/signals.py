@@ -0,0 +1,8 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent by the admin routes after articles or practice questions change.
+# The sender is the table name; `ids` lists the affected row ids and `rows`
+# carries the written rows when the write returned them.
+content_changed = _signals.signal("content-changed")
@@ -1,11 +1,49 @@
 from flask import Blueprint, request, jsonify
 from middlewares.auth import token_required  
-from app import supabase  
-from config import ADMIN_SECRET  # Load admin secret securely
+from app.services import get_supabase
+from app.cache import ReadCache
+from app.content_index import content_index
+from app.models import Article
+from app.progress.summary import get_summary, progress_events, record_progress
+from app.search import search_index
+from app.signals import content_changed
+from config import ADMIN_SECRET, READ_CACHE_SIZE, READ_CACHE_TTL  # Load admin secret securely
 import re
 
 users = Blueprint('users', __name__)
 
+ARTICLES_PAGE_SIZE = 20
+ARTICLES_MAX_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 50
+PROGRESS_BATCH_LIMIT = 500
+
+# Article and question reads, invalidated whenever an admin changes the table.
+# Other workers see the change after at most READ_CACHE_TTL seconds.
+read_cache = ReadCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+
+@content_changed.connect
+def invalidate_read_cache(table, **kwargs):
+    read_cache.invalidate(table)
+
+def cached_json(namespaces, key, loader):
+    """JSON response from the read cache with an ETag, or None if `loader` found nothing"""
+    entry = read_cache.get_or_load(namespaces, key, loader)
+    if entry is None:
+        return None
+
+    # No Last-Modified: workers only learn of other workers' writes through the
+    # content, so the content hash is the one validator that agrees across them
+    data, etag = entry
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # Clients must revalidate, which is cheap with a 304
+    return response.make_conditional(request)
+
+def load_article(article_id):
+    response = get_supabase().table("articles").select("*").eq("id", article_id).execute()
+    return response.data[0] if response.data else None
+
 def is_valid_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -37,7 +75,7 @@ def signup():
 
     try:
         # ✅ Sign up the user
-        response = supabase.auth.sign_up({
+        response = get_supabase().auth.sign_up({
             "email": email,
             "password": password,
             "data": {  
@@ -62,7 +100,7 @@ def signup():
             "phone": phone,
             "role": role  
         }
-        supabase.table("users").insert(user_data).execute()
+        get_supabase().table("users").insert(user_data).execute()
 
         return jsonify({
             "message": "User registered successfully. Check your email to verify your account.",
@@ -82,7 +120,7 @@ def login():
     password = data.get("password")
 
     try:
-        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        response = get_supabase().auth.sign_in_with_password({"email": email, "password": password})
 
         if hasattr(response, 'error') and response.error:
             return jsonify({"error": response.error.message}), 400
@@ -108,7 +146,7 @@ def resend_confirmation():
     data = request.get_json()
     email = data.get("email")
     try:
-        response = supabase.auth.resend({"email": email})
+        response = get_supabase().auth.resend({"email": email})
 
         if response.error:
             return jsonify({"error": response.error.message}), 400
@@ -128,7 +166,7 @@ def google_login():
     access_token = data.get("access_token")  # Token from Google OAuth
 
     try:
-        response = supabase.auth.sign_in_with_id_token({"provider": "google", "id_token": access_token})
+        response = get_supabase().auth.sign_in_with_id_token({"provider": "google", "id_token": access_token})
 
         if response.error:
             return jsonify({"error": response.error.message}), 400
@@ -139,13 +177,84 @@ def google_login():
         return jsonify({"error": str(e)}), 500
 
 
-### --- 📖 Get All Articles (Users Can Read) ---
+### --- 📖 List Articles (Users Can Read) ---
 @users.route('/articles', methods=['GET'])
 @token_required
 def get_articles(user):
-    """Users can read all articles"""
-    response = supabase.table("articles").select("*").execute()
-    return jsonify(response.data)
+    """Users can page through articles (keyset pagination on id)"""
+    # ?limit=<n>&cursor=<previous next_cursor>&view=summary|full
+    try:
+        limit = min(int(request.args.get("limit", ARTICLES_PAGE_SIZE)), ARTICLES_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    view = request.args.get("view", "summary")
+    if view not in ("summary", "full"):
+        return jsonify({"error": "view must be 'summary' or 'full'"}), 400
+    columns = ",".join(Article.summary_columns) if view == "summary" else "*"
+
+    cursor = request.args.get("cursor")
+
+    def load_page():
+        # Fetch one extra row to learn whether another page exists
+        query = get_supabase().table("articles").select(columns).order("id").limit(limit + 1)
+        if cursor:
+            query = query.gt("id", cursor)
+        rows = query.execute().data
+
+        has_more = len(rows) > limit
+        articles = rows[:limit]
+        return {
+            "articles": articles,
+            "next_cursor": articles[-1]["id"] if has_more else None
+        }
+
+    return cached_json(("articles",), ("list", view, limit, cursor), load_page)
+
+### --- 📖 Get One Article ---
+@users.route('/articles/<string:article_id>', methods=['GET'])
+@token_required
+def get_article(user, article_id):
+    """Users can read a single article with its full content"""
+    response = cached_json(("articles",), ("article", article_id), lambda: load_article(article_id))
+    if response is None:
+        return jsonify({"error": "Article not found"}), 404
+    return response
+### --- 🔍 Search Articles and Questions ---
+@users.route('/search', methods=['GET'])
+@token_required
+def search(user):
+    """Users can search articles and practice questions (ranked, prefix matching)"""
+    # ?q=<text>&type=article|question&category=<c>&difficulty=<d>&limit=<n>
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = min(int(request.args.get("limit", ARTICLES_PAGE_SIZE)), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    kind = request.args.get("type")
+    if kind not in (None, "article", "question"):
+        return jsonify({"error": "type must be 'article' or 'question'"}), 400
+
+    found = search_index.search(
+        query, limit=limit, kind=kind,
+        category=request.args.get("category"), difficulty=request.args.get("difficulty"),
+    )
+    if found is None:
+        response = jsonify({"error": "Search is starting up, please try again shortly"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "2"
+        return response
+
+    total, results = found
+    return jsonify({"query": query, "total": total, "results": results})
+
 ### --- 📚 Mark Practice Questions (Track Progress) ---
 @users.route('/questions/<string:question_id>/mark-read', methods=['POST'])
 @token_required
@@ -155,36 +264,93 @@ def mark_question_as_read(user, question_id):
         "user_id": user["id"],  
         "question_id": question_id
     }
-    response = supabase.table("userprogress").insert(progress_entry).execute()
+    # Idempotent: marking the same question again does not add another row
+    response = get_supabase().table("userprogress").upsert(
+        progress_entry, on_conflict="user_id,question_id", ignore_duplicates=True
+    ).execute()
+    record_progress(user["id"], response.data)
     return jsonify(response.data)
 
-# TODO: fetch question from category not article 
+def mark_progress(user_id, column, ids):
+    """Upsert one progress row per id, returning only the rows that were newly created"""
+    rows = [{"user_id": user_id, column: item_id} for item_id in ids]
+    if not rows:
+        return []
+    response = get_supabase().table("userprogress").upsert(
+        rows, on_conflict=f"user_id,{column}", ignore_duplicates=True
+    ).execute()
+    return response.data
+
+@users.route('/progress/batch', methods=['POST'])
+@token_required
+def mark_progress_batch(user):
+    """Users can mark many questions and articles as read in one call"""
+    data = request.get_json(silent=True) or {}
+    question_ids = data.get("question_ids", [])
+    article_ids = data.get("article_ids", [])
+
+    if not isinstance(question_ids, list) or not isinstance(article_ids, list):
+        return jsonify({"error": "question_ids and article_ids must be lists"}), 400
+    # Drop repeats while keeping the caller's order
+    question_ids = list(dict.fromkeys(str(i) for i in question_ids))
+    article_ids = list(dict.fromkeys(str(i) for i in article_ids))
+    if not question_ids and not article_ids:
+        return jsonify({"error": "Provide question_ids and/or article_ids"}), 400
+    if len(question_ids) + len(article_ids) > PROGRESS_BATCH_LIMIT:
+        return jsonify({"error": f"At most {PROGRESS_BATCH_LIMIT} ids per request"}), 400
+
+    created = mark_progress(user["id"], "question_id", question_ids)
+    created += mark_progress(user["id"], "article_id", article_ids)
+    record_progress(user["id"], created)
+
+    return jsonify({
+        "marked": created,
+        "already_marked": len(question_ids) + len(article_ids) - len(created)
+    })
+
 @users.route('/articles/<string:article_id>/questions', methods=['GET'])
 @token_required
 def get_related_questions(user, article_id):
-    """Users can view practice questions related to a specific article"""
-    # Fetch the article to ensure it exists
-    response_article = supabase.table("articles").select("*").eq("id", article_id).execute()
-    article = response_article.data
-
-    if not article:
-        return jsonify({"error": "Article not found"}), 404
+    """Users can view practice questions in the same category as an article"""
+    # Served from the in-memory content index; Supabase is only asked on a cold index
+    article = content_index.article(article_id)
+    if article is None:
+        response_article = get_supabase().table("articles").select(",".join(Article.summary_columns)).eq("id", article_id).execute()
+        if not response_article.data:
+            return jsonify({"error": "Article not found"}), 404
+        article = response_article.data[0]
+        content_index.remember_article(article)
 
     # Retrieve the category of the article
-    category = article[0].get('category')
+    category = article.get('category')
     if not category:
         return jsonify({"error": "Article does not have a category"}), 400
 
-    # Fetch related practice questions based on the article's category
-    response_questions = supabase.table("practicequestions").select("*").eq("category", category).execute()
-    questions = response_questions.data
+    def load_related():
+        questions = content_index.questions_for(category)
+        if questions is None:
+            # Index still loading: fetch related practice questions based on the article's category
+            questions = get_supabase().table("practicequestions").select("*").eq("category", category).execute().data
+        return {"article": article, "related_questions": sorted(questions, key=lambda q: str(q["id"]))}
 
-    return jsonify({"article": article[0], "related_questions": questions})
+    return cached_json(("articles", "practicequestions"), ("related", article_id), load_related)
 
 ### --- 📊 Get User Progress ---
 @users.route('/user/progress', methods=['GET'])
 @token_required
 def get_user_progress(user):
     """Users can check their reading progress"""
-    response = supabase.table("userprogress").select("*").eq("user_id", user["id"]).execute()
+    response = get_supabase().table("userprogress").select("*").eq("user_id", user["id"]).execute()
     return jsonify(response.data)
+
+@users.route('/user/progress/summary', methods=['GET'])
+@token_required
+def get_user_progress_summary(user):
+    """Users can see completed counts by difficulty and category, completion percentage and recent activity"""
+    return jsonify(get_summary(user["id"]))
+
+@users.route('/user/progress/events', methods=['GET'])
+@token_required
+def get_user_progress_events(user):
+    """Users can download their progress history as compact columns for analytics"""
+    return jsonify(progress_events(user["id"]))
@@ -0,0 +1,154 @@
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+from app.services import get_supabase, current_services, using_services
+
+
+class WriteBehindQueue:
+    """Buffer rows for a Supabase table and insert them in bulk from a background thread.
+
+    Rows are flushed when `batch_size` rows are waiting or `flush_interval`
+    seconds have passed. The buffer holds at most `maxsize` rows; when it is
+    full, `submit` waits up to `put_timeout` seconds and then writes the row
+    synchronously, so a slow database pushes back on callers instead of
+    growing memory or dropping data. Each row is written through the client
+    registry of the app that submitted it.
+    """
+
+    def __init__(self, table, batch_size=50, flush_interval=2.0, maxsize=1000,
+                 max_retries=3, put_timeout=0.5):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.sync_writes = 0
+        self.batches = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._stop.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.table}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue a row for insertion, writing it inline if the buffer stays full"""
+        self._ensure_worker()
+        self.submitted += 1
+        try:
+            self._queue.put((current_services(), row), timeout=self.put_timeout)
+        except queue.Full:
+            self.sync_writes += 1
+            self._write([row])
+
+    def _write_batch(self, batch):
+        """Write (registry, row) pairs, one insert per registry"""
+        by_registry = {}
+        for registry, row in batch:
+            by_registry.setdefault(registry, []).append(row)
+        for registry, rows in by_registry.items():
+            with using_services(registry):
+                self._write(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write_batch(batch)
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch or interval is full"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        """Bulk insert rows, retrying with jittered exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                get_supabase().table(self.table).insert(rows).execute()
+                self.written += len(rows)
+                self.batches += 1
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(rows)
+                    print(f"🚨 Write-behind insert into {self.table} failed, dropping {len(rows)} rows:", str(e))
+                    return False
+                time.sleep(min(0.2 * 2 ** attempt, 5) * random.uniform(0.5, 1.5))
+
+    def drain(self, timeout=10):
+        """Stop the worker and flush everything still buffered"""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._write_batch(batch)
+
+    def stats(self):
+        return {
+            "table": self.table,
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "sync_writes": self.sync_writes,
+            "batches": self.batches,
+        }
+
+
+_queues = []
+
+
+def create_queue(table, **options):
+    """Create a write-behind queue that is drained when the process exits"""
+    write_queue = WriteBehindQueue(table, **options)
+    _queues.append(write_queue)
+    return write_queue
+
+
+@atexit.register
+def drain_all(timeout=10):
+    """Flush every write-behind queue (called on shutdown)"""
+    for write_queue in _queues:
+        write_queue.drain(timeout)
@@ -0,0 +1,281 @@
+"""In-process stand-ins for Supabase (PostgREST + Auth) and the OpenAI-compatible chat API.
+
+They are httpx transports, so the real supabase, postgrest and openai clients
+(and our pooling, retries and serialization around them) run unchanged; only
+the network hop is replaced by a handler with configurable latency.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+import jwt
+
+
+class Latency:
+    """Injected service time: `ms` milliseconds, randomly scaled by ±`jitter`"""
+
+    def __init__(self, ms=0.0, jitter=0.25):
+        self.ms = ms
+        self.jitter = jitter
+
+    def wait(self):
+        if self.ms > 0:
+            time.sleep(self.ms / 1000 * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def parse_filter(value):
+    """PostgREST filter `op.value` -> predicate on a column value"""
+    op, _, operand = value.partition(".")
+    if op == "in":
+        allowed = {v.strip('"') for v in operand.strip("()").split(",")}
+        return lambda v: str(v) in allowed
+    if op == "is":
+        return lambda v: v is None if operand == "null" else str(v).lower() == operand
+    compare = {
+        "eq": lambda a, b: a == b,
+        "neq": lambda a, b: a != b,
+        "gt": lambda a, b: a > b,
+        "gte": lambda a, b: a >= b,
+        "lt": lambda a, b: a < b,
+        "lte": lambda a, b: a <= b,
+    }[op]
+
+    def predicate(v):
+        if v is None:
+            return False
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            try:
+                return compare(v, type(v)(operand))
+            except ValueError:
+                pass
+        return compare(str(v), operand)
+    return predicate
+
+
+class FakeSupabase:
+    """Tables kept in memory behind the PostgREST and GoTrue HTTP APIs"""
+
+    def __init__(self, jwt_secret, db_latency=None, auth_latency=None):
+        self.jwt_secret = jwt_secret
+        self.db_latency = db_latency or Latency()
+        self.auth_latency = auth_latency or Latency()
+        self.tables = {}
+        self.accounts = {}  # email -> {"id", "password"}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.requests = 0
+
+    # --- Data ---
+
+    def add_user(self, email, password, role="user"):
+        user_id = str(uuid.uuid4())
+        self.accounts[email] = {"id": user_id, "email": email, "password": password}
+        self.tables.setdefault("users", []).append({"id": user_id, "email": email, "role": role})
+        return user_id
+
+    def token_for(self, user_id, email=None, ttl=3600):
+        now = int(time.time())
+        return jwt.encode(
+            {"sub": user_id, "email": email, "aud": "authenticated", "role": "authenticated",
+             "iat": now, "exp": now + ttl},
+            self.jwt_secret, algorithm="HS256",
+        )
+
+    def user_json(self, user_id, email):
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "id": user_id, "aud": "authenticated", "role": "authenticated", "email": email,
+            "app_metadata": {"provider": "email"}, "user_metadata": {},
+            "created_at": now, "email_confirmed_at": now, "confirmed_at": now,
+        }
+
+    # --- HTTP ---
+
+    def handle(self, request):
+        self.requests += 1
+        path = request.url.path
+        if path.startswith("/rest/v1/"):
+            self.db_latency.wait()
+            return self.handle_rest(request, path[len("/rest/v1/"):])
+        if path.startswith("/auth/v1/"):
+            self.auth_latency.wait()
+            return self.handle_auth(request, path[len("/auth/v1/"):])
+        return httpx.Response(404, json={"message": f"No fake for {path}"})
+
+    def handle_auth(self, request, path):
+        if path == "token" and request.url.params.get("grant_type") == "password":
+            body = json.loads(request.content)
+            account = self.accounts.get(body.get("email"))
+            if not account or account["password"] != body.get("password"):
+                return httpx.Response(400, json={"code": 400, "error_code": "invalid_credentials",
+                                                 "msg": "Invalid login credentials"})
+            return httpx.Response(200, json={
+                "access_token": self.token_for(account["id"], account["email"]),
+                "token_type": "bearer",
+                "expires_in": 3600,
+                "refresh_token": uuid.uuid4().hex,
+                "user": self.user_json(account["id"], account["email"]),
+            })
+        if path == "user":
+            token = request.headers.get("Authorization", "").replace("Bearer ", "")
+            try:
+                claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+            except jwt.PyJWTError:
+                return httpx.Response(401, json={"code": 401, "msg": "invalid JWT"})
+            return httpx.Response(200, json=self.user_json(claims["sub"], claims.get("email")))
+        return httpx.Response(404, json={"code": 404, "msg": f"No fake for auth/{path}"})
+
+    def handle_rest(self, request, table):
+        params = request.url.params
+        prefer = request.headers.get("Prefer", "")
+        filters = [
+            (column, parse_filter(value)) for column, value in params.multi_items()
+            if column not in ("select", "order", "limit", "offset", "on_conflict", "columns")
+        ]
+
+        with self._lock:
+            rows = self.tables.setdefault(table, [])
+            matching = [r for r in rows if all(predicate(r.get(column)) for column, predicate in filters)]
+
+            if request.method in ("GET", "HEAD"):
+                return self.select(request, matching, params, prefer)
+            if request.method == "POST":
+                return self.insert(table, rows, json.loads(request.content), params, prefer)
+            if request.method == "PATCH":
+                changes = json.loads(request.content)
+                for row in matching:
+                    row.update(changes)
+                return httpx.Response(200, json=matching)
+            if request.method == "DELETE":
+                for row in matching:
+                    rows.remove(row)
+                return httpx.Response(200, json=matching)
+        return httpx.Response(405)
+
+    def select(self, request, rows, params, prefer):
+        order = params.get("order")
+        if order:
+            column, _, direction = order.partition(".")
+            rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith("desc"))
+        total = len(rows)
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+
+        select = params.get("select", "*")
+        if select != "*":
+            columns = [c.strip() for c in select.split(",")]
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+
+        headers = {}
+        if "count=exact" in prefer:
+            headers["Content-Range"] = f"0-{max(len(rows) - 1, 0)}/{total}"
+        if request.method == "HEAD":
+            return httpx.Response(200, headers=headers)
+        return httpx.Response(200, json=rows, headers=headers)
+
+    def insert(self, table, rows, payload, params, prefer):
+        items = payload if isinstance(payload, list) else [payload]
+        conflict = [c for c in params.get("on_conflict", "").split(",") if c]
+        if not conflict and "resolution=" in prefer:
+            conflict = ["id"]
+
+        created = []
+        for item in items:
+            if conflict:
+                existing = next((r for r in rows if all(str(r.get(c)) == str(item.get(c)) for c in conflict)), None)
+                if existing is not None:
+                    if "resolution=merge-duplicates" in prefer:
+                        existing.update(item)
+                        created.append(existing)
+                    continue
+            row = dict(item)
+            if "id" not in row:
+                row["id"] = self._next_id
+                self._next_id += 1
+            if table == "userprogress":
+                row.setdefault("completed_at", datetime.now(timezone.utc).isoformat())
+            rows.append(row)
+            created.append(row)
+        return httpx.Response(201, json=created)
+
+
+class FakeLLM:
+    """OpenAI-compatible /chat/completions with a fixed answer, streamed word by word when asked"""
+
+    ANSWER = (
+        "Binary search halves the search interval each step, so it runs in O(log n) time. "
+        "Keep low and high pointers, compare the middle element with the target, and discard "
+        "the half that cannot contain it."
+    )
+
+    def __init__(self, latency=None, token_latency=None):
+        self.latency = latency or Latency()  # Time to first token
+        self.token_latency = token_latency or Latency(0)  # Per streamed chunk
+        self.requests = 0
+
+    def handle(self, request):
+        self.requests += 1
+        body = json.loads(request.content)
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        self.latency.wait()
+
+        words = self.ANSWER.split(" ")
+        if body.get("stream"):
+            def chunks():
+                for i, word in enumerate(words):
+                    self.token_latency.wait()
+                    chunk = {
+                        "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                     "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n".encode()
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model"), "choices": [], "usage": {
+                                 "prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                                 "total_tokens": prompt_tokens + len(words)}}
+                    yield f"data: {json.dumps(usage)}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+            return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=chunks())
+
+        return httpx.Response(200, json={
+            "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.ANSWER}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+
+def supabase_client(fake, url, key, pool_size=20):
+    """A real Supabase client whose HTTP calls are served by `fake`"""
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+    from app.metrics import httpx_hooks
+
+    http_client = httpx.Client(
+        transport=httpx.MockTransport(fake.handle),
+        limits=httpx.Limits(max_connections=pool_size),
+        follow_redirects=True,
+        event_hooks=httpx_hooks(),
+    )
+    return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+
+def llm_gateway(fake, **options):
+    """A real LLMGateway (concurrency limits, retries) whose OpenAI client is served by `fake`"""
+    from openai import OpenAI
+    from app.llm import LLMGateway
+
+    gateway = LLMGateway(**options)
+    gateway.http_client = httpx.Client(transport=httpx.MockTransport(fake.handle))
+    gateway.client = OpenAI(
+        api_key=options["api_key"], base_url=options["base_url"],
+        http_client=gateway.http_client, max_retries=0,
+    )
+    return gateway
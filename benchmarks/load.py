@@ -0,0 +1,298 @@
+"""Load test: mixed traffic against the Flask app, with Supabase and the LLM replaced by
+in-process fakes (benchmarks/fakes.py) that add configurable latency.
+
+Drives login, article listing, related questions, mark-read and chat requests at one or
+more concurrency levels and reports throughput and p50/p95/p99 latency per endpoint.
+
+Usage (from the repository root):
+
+    python benchmarks/load.py                                   # concurrency 1, 8 and 32
+    python benchmarks/load.py --concurrency 16 --requests 2000 --llm-ms 1500
+    python benchmarks/load.py --mix articles=60,related=40      # only some endpoints
+    python benchmarks/load.py --save benchmarks/load_baseline.json
+    python benchmarks/load.py --baseline benchmarks/load_baseline.json   # exit 1 on regression
+
+Baselines are machine specific; compare runs made on the same machine with the same options.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Placeholders so config.py can be imported; every client is replaced by a fake below
+for name, value in {
+    "SUPABASE_URL": "https://bench.supabase.co",
+    "SUPABASE_KEY": "bench-service-key",
+    "DEEPSEEK_API_URL": "https://api.deepseek.com",
+    "DEEPSEEK_API_KEY": "bench",
+    "SUPABASE_JWT_SECRET": "bench-jwt-secret-" + "x" * 32,
+}.items():
+    os.environ.setdefault(name, value)
+
+import config  # noqa: E402
+from benchmarks.fakes import FakeLLM, FakeSupabase, Latency, llm_gateway, supabase_client  # noqa: E402
+
+DEFAULT_MIX = {"login": 5, "articles": 35, "related": 25, "mark_read": 20, "chat": 15}
+CATEGORIES = ["arrays", "strings", "linked-lists", "trees", "graphs", "dynamic-programming", "sorting", "hashing"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+CHAT_QUERIES = [f"Explain {topic} with an example" for topic in (
+    "binary search", "two pointers", "sliding window", "BFS", "DFS", "Dijkstra", "quicksort",
+    "merge sort", "heaps", "tries", "union find", "memoization", "topological sort", "prefix sums",
+)]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    return mix
+
+
+class Scenario:
+    """Seeded fake backend, the app under test, and one request generator per endpoint"""
+
+    def __init__(self, args):
+        self.args = args
+        self.supabase = FakeSupabase(
+            config.SUPABASE_JWT_SECRET,
+            db_latency=Latency(args.db_ms, args.jitter),
+            auth_latency=Latency(args.auth_ms, args.jitter),
+        )
+        self.llm = FakeLLM(latency=Latency(args.llm_ms, args.jitter))
+        self.seed()
+
+        from app import create_app
+        from app.services import LLM_OPTIONS, Services
+        import middlewares.auth as auth
+
+        auth.AUTH_MODE = args.auth_mode
+        # Background work (write-behind, index builds) picks up the app's registry as well
+        self.services = Services()
+        self.services.override("supabase", supabase_client(self.supabase, config.SUPABASE_URL, config.SUPABASE_KEY))
+        self.services.override("llm", llm_gateway(self.llm, **LLM_OPTIONS))
+        self.app = create_app(services=self.services, preload=False)
+
+        if not args.cold_index:
+            from app.content_index import content_loader
+            with self.app.app_context():
+                content_loader.build()
+
+        self.local = threading.local()
+
+    def seed(self):
+        rng = random.Random(42)
+        tables = self.supabase.tables
+        tables["articles"] = [
+            {"id": f"article-{i:05d}", "title": f"Article {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+             "content": f"# Article {i}\n\n" + "Lorem ipsum dolor sit amet. " * 200}
+            for i in range(self.args.articles)
+        ]
+        tables["practicequestions"] = [
+            {"id": i, "title": f"Question {i}", "link": f"https://example.com/q/{i}",
+             "difficulty": rng.choice(DIFFICULTIES), "category": rng.choice(CATEGORIES)}
+            for i in range(1, self.args.questions + 1)
+        ]
+        tables["userprogress"] = []
+        tables["chatbotinteractions"] = []
+
+        self.users = []
+        for i in range(self.args.users):
+            email = f"user{i}@bench.local"
+            user_id = self.supabase.add_user(email, "password")
+            self.users.append({"id": user_id, "email": email, "token": self.supabase.token_for(user_id, email)})
+
+    def client(self):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def send(self, endpoint, rng):
+        """Issue one request for `endpoint`; returns the status code"""
+        user = rng.choice(self.users)
+        headers = {"Authorization": f"Bearer {user['token']}"}
+        client = self.client()
+
+        if endpoint == "login":
+            response = client.post("/users/login", json={"email": user["email"], "password": "password"})
+        elif endpoint == "articles":
+            params = {"limit": 20}
+            if rng.random() < 0.5:
+                params["cursor"] = f"article-{rng.randrange(self.args.articles):05d}"
+            response = client.get("/users/articles", query_string=params, headers=headers)
+        elif endpoint == "related":
+            article_id = f"article-{rng.randrange(self.args.articles):05d}"
+            response = client.get(f"/users/articles/{article_id}/questions", headers=headers)
+        elif endpoint == "mark_read":
+            question_id = rng.randrange(1, self.args.questions + 1)
+            response = client.post(f"/users/questions/{question_id}/mark-read", headers=headers)
+        elif endpoint == "chat":
+            response = client.post("/chat", json={"user_query": rng.choice(CHAT_QUERIES)}, headers=headers)
+        else:
+            raise ValueError(endpoint)
+        return response.status_code
+
+
+def run_level(scenario, concurrency, count, mix, seed):
+    """Send `count` requests with `concurrency` threads; returns per-endpoint samples and wall time"""
+    rng = random.Random(seed)
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[n] for n in names], k=count)
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    def task(index, endpoint):
+        task_rng = random.Random(seed * 1_000_003 + index)
+        started = time.perf_counter()
+        try:
+            status = scenario.send(endpoint, task_rng)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - started
+        with lock:
+            samples[endpoint].append(elapsed)
+            if status >= 400:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(task, range(count), plan))
+    return samples, errors, time.perf_counter() - started
+
+
+def summarize(samples, errors, wall):
+    endpoints = {}
+    for name, values in samples.items():
+        values = sorted(v * 1000 for v in values)
+        endpoints[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": round(percentile(values, 0.50), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+            "mean_ms": round(statistics.fmean(values), 2) if values else 0.0,
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+    total = sum(len(v) for v in samples.values())
+    return {"requests": total, "seconds": round(wall, 3), "throughput_rps": round(total / wall, 1), "endpoints": endpoints}
+
+
+def print_level(concurrency, result, baseline=None):
+    print(f"\nconcurrency {concurrency}: {result['requests']} requests in {result['seconds']:.2f}s "
+          f"= {result['throughput_rps']:.1f} req/s"
+          + (f" (baseline {baseline['throughput_rps']:.1f})" if baseline else ""))
+    print(f"  {'endpoint':<11}{'count':>7}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+          + (f"{'base p95':>10}{'base p99':>10}" if baseline else ""))
+    for name, row in result["endpoints"].items():
+        line = (f"  {name:<11}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>9.1f}"
+                f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+        reference = baseline["endpoints"].get(name) if baseline else None
+        if reference:
+            line += f"{reference['p95_ms']:>10.1f}{reference['p99_ms']:>10.1f}"
+        print(line)
+
+
+def find_regressions(results, baseline, tolerance, slack_ms):
+    """Tail latencies or throughput that got worse than the baseline by more than the tolerance"""
+    regressions = []
+    for level, result in results.items():
+        reference = baseline.get(level)
+        if not reference:
+            continue
+        if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"c={level} throughput: {result['throughput_rps']:.1f} < "
+                               f"{reference['throughput_rps'] * (1 - tolerance):.1f} req/s allowed")
+        for name, row in result["endpoints"].items():
+            base_row = reference["endpoints"].get(name)
+            if not base_row:
+                continue
+            for key in ("p95_ms", "p99_ms"):
+                limit = base_row[key] * (1 + tolerance) + slack_ms
+                if row[key] > limit:
+                    regressions.append(f"c={level} {name} {key[:3]}: {row[key]:.1f} ms > {limit:.1f} ms allowed")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test against in-process Supabase/LLM fakes")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=100, help="unrecorded requests before the first level")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="endpoint weights, e.g. login=5,articles=35,related=25,mark_read=20,chat=15")
+    parser.add_argument("--db-ms", type=float, default=15.0, help="PostgREST latency per call")
+    parser.add_argument("--auth-ms", type=float, default=40.0, help="Supabase Auth latency per call")
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="LLM latency per completion")
+    parser.add_argument("--jitter", type=float, default=0.25, help="relative random spread of injected latency")
+    parser.add_argument("--auth-mode", choices=["local", "remote"], default=config.AUTH_MODE)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--articles", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--cold-index", action="store_true", help="do not build the content index before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="allowed absolute latency noise (default 5)")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    scenario = Scenario(args)
+
+    if args.warmup:
+        run_level(scenario, max(levels), args.warmup, args.mix, seed=0)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["levels"]
+
+    print(f"Mixed load: {args.requests} requests per level, latency db={args.db_ms}ms auth={args.auth_ms}ms "
+          f"llm={args.llm_ms}ms, auth mode {args.auth_mode}")
+    results = {}
+    for concurrency in levels:
+        db_calls = scenario.supabase.requests
+        samples, errors, wall = run_level(scenario, concurrency, args.requests, args.mix, seed=args.seed + concurrency)
+        result = summarize(samples, errors, wall)
+        result["supabase_calls_per_request"] = round((scenario.supabase.requests - db_calls) / args.requests, 2)
+        results[str(concurrency)] = result
+        print_level(concurrency, result, baseline.get(str(concurrency)) if baseline else None)
+        print(f"  Supabase calls per request: {result['supabase_calls_per_request']}")
+
+    from app.writebehind import drain_all
+    drain_all()
+
+    if args.save:
+        options = {k: v for k, v in vars(args).items() if k not in ("save", "baseline")}
+        with open(args.save, "w") as f:
+            json.dump({"options": options, "levels": results}, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if baseline:
+        failures = find_regressions(results, baseline, args.tolerance, args.slack_ms)
+        if failures:
+            print("\nLatency regression:")
+            for failure in failures:
+                print("  " + failure)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
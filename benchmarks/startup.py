@@ -0,0 +1,188 @@
+"""Worker cold-start benchmark.
+
+Starts fresh interpreters and measures how long a new worker takes to become ready:
+
+    interpreter    bare `python -c pass`
+    import         `import app`
+    create_app     building the Flask app and registering blueprints
+    first_request  GET / through the test client
+    ready          process start until the first response (includes all of the above)
+    clients        creating the Supabase client and LLM gateway afterwards (no network)
+
+Usage (from the repository root):
+
+    python benchmarks/startup.py                          # medians over 10 runs
+    python benchmarks/startup.py --save benchmarks/startup_baseline.json
+    python benchmarks/startup.py --baseline benchmarks/startup_baseline.json   # exit 1 on regression
+    python benchmarks/startup.py --max-ready-ms 1000      # absolute budget, e.g. in CI
+    python benchmarks/startup.py --importtime 20          # slowest imports, to find the culprit
+
+Baselines are machine specific; record one on the machine that runs the gate.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line when ready and one after creating the clients
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+t2 = time.perf_counter()
+flask_app.test_client().get("/")
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2}), flush=True)
+from app.services import services
+services.get("supabase")
+services.get("llm")
+print(json.dumps({"clients": time.perf_counter() - t3}), flush=True)
+"""
+
+METRICS = ["interpreter", "import", "create_app", "first_request", "ready", "clients"]
+
+
+def child_env():
+    """Environment for the child: placeholders for required settings, no background warm-up"""
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "https://example.supabase.co")
+    env.setdefault("SUPABASE_KEY", "benchmark")
+    env.setdefault("DEEPSEEK_API_URL", "https://api.deepseek.com")
+    env.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    env["CONTENT_INDEX_PRELOAD"] = "false"
+    env["SERVICES_PRELOAD"] = "false"
+    return env
+
+
+def interpreter_startup(env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return time.perf_counter() - started
+
+
+def measure_once(env):
+    """Timings (seconds) for one cold start"""
+    sample = {"interpreter": interpreter_startup(env)}
+
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    first_line = child.stdout.readline()
+    sample["ready"] = time.perf_counter() - started
+    second_line = child.stdout.readline()
+    _, stderr = child.communicate()
+    if child.returncode != 0 or not second_line:
+        raise RuntimeError(f"Benchmark child failed:\n{stderr}")
+
+    sample.update(json.loads(first_line))
+    sample.update(json.loads(second_line))
+    return sample
+
+
+def summarize(samples):
+    """Median, min and max per metric, in milliseconds"""
+    summary = {}
+    for metric in METRICS:
+        values = sorted(s[metric] * 1000 for s in samples)
+        summary[metric] = {
+            "median_ms": round(statistics.median(values), 1),
+            "min_ms": round(values[0], 1),
+            "max_ms": round(values[-1], 1),
+        }
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    print(f"{'metric':<15}{'median':>10}{'min':>10}{'max':>10}" + (f"{'baseline':>11}" if baseline else ""))
+    for metric in METRICS:
+        row = summary[metric]
+        line = f"{metric:<15}{row['median_ms']:>10.1f}{row['min_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        if baseline and metric in baseline:
+            line += f"{baseline[metric]['median_ms']:>11.1f}"
+        print(line)
+
+
+def find_regressions(summary, baseline, tolerance, slack_ms):
+    """Metrics whose median grew by more than `tolerance` (relative) plus `slack_ms` (absolute noise)"""
+    regressions = []
+    for metric, reference in baseline.items():
+        if metric == "interpreter" or metric not in summary:
+            continue  # Interpreter start-up is not ours to regress
+        limit = reference["median_ms"] * (1 + tolerance) + slack_ms
+        if summary[metric]["median_ms"] > limit:
+            regressions.append(f"{metric}: {summary[metric]['median_ms']:.1f} ms > {limit:.1f} ms allowed")
+    return regressions
+
+
+def print_importtime(env, top):
+    """Show the modules with the largest cumulative import time during `import app; create_app()`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    print("\nSlowest imports (cumulative ms):")
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>10.1f}  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker import time and time to first request")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    parser.add_argument("--slack-ms", type=float, default=20.0, help="allowed absolute slowdown for noise (default 20)")
+    parser.add_argument("--max-ready-ms", type=float, help="fail if the median time to first request exceeds this")
+    parser.add_argument("--importtime", type=int, metavar="N", help="also list the N slowest imports")
+    args = parser.parse_args()
+
+    env = child_env()
+    measure_once(env)  # Warm the OS file cache and bytecode cache
+    samples = [measure_once(env) for _ in range(args.runs)]
+    summary = summarize(samples)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+
+    print(f"Cold start over {args.runs} runs (Python {sys.version.split()[0]})")
+    print_summary(summary, baseline)
+    if args.importtime:
+        print_importtime(env, args.importtime)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": sys.version.split()[0], "runs": args.runs, "metrics": summary}, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    failures = []
+    if baseline:
+        failures += find_regressions(summary, baseline, args.tolerance, args.slack_ms)
+    if args.max_ready_ms is not None and summary["ready"]["median_ms"] > args.max_ready_ms:
+        failures.append(f"ready: {summary['ready']['median_ms']:.1f} ms > {args.max_ready_ms:.1f} ms budget")
+
+    if failures:
+        print("\nStartup regression:")
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # Load environment variables from .env file
 load_dotenv(override=True)
@@ -11,3 +10,93 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # Your RLS key
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 
+
+# Authentication
+AUTH_MODE = os.getenv("AUTH_MODE", "local")  # "local" verifies JWTs in-process, "remote" asks Supabase on every request
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")  # Project JWT secret (HS256 projects)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+ROLE_CACHE_TTL = int(os.getenv("ROLE_CACHE_TTL", 300))  # Seconds a user's role is trusted before re-reading it
+ROLE_CACHE_SIZE = int(os.getenv("ROLE_CACHE_SIZE", 10000))
+
+# Chat interaction persistence (write-behind batching)
+INTERACTION_BATCH_SIZE = int(os.getenv("INTERACTION_BATCH_SIZE", 50))  # Rows per bulk insert
+INTERACTION_FLUSH_INTERVAL = float(os.getenv("INTERACTION_FLUSH_INTERVAL", 2.0))  # Max seconds a row waits
+INTERACTION_QUEUE_SIZE = int(os.getenv("INTERACTION_QUEUE_SIZE", 1000))  # Rows buffered before callers are slowed down
+INTERACTION_MAX_RETRIES = int(os.getenv("INTERACTION_MAX_RETRIES", 3))
+
+# Chat history store
+# "memory" (single worker), "sqlite" (shared by workers) or "auto": sqlite when gunicorn runs several workers
+CHAT_HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "auto")
+CHAT_HISTORY_PATH = os.getenv("CHAT_HISTORY_PATH", "chat_history.sqlite3")
+CHAT_HISTORY_TTL = int(os.getenv("CHAT_HISTORY_TTL", 3600))  # Idle seconds before a conversation is forgotten
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", 50))  # Per user
+CHAT_HISTORY_MAX_USER_CHARS = int(os.getenv("CHAT_HISTORY_MAX_USER_CHARS", 32000))  # Per user (memory backend)
+CHAT_HISTORY_MAX_TOTAL_CHARS = int(os.getenv("CHAT_HISTORY_MAX_TOTAL_CHARS", 64_000_000))  # All users (memory backend)
+CHAT_HISTORY_MAX_TOTAL_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_TOTAL_MESSAGES", 500_000))  # All users (sqlite backend)
+CHAT_HISTORY_MAX_USERS = int(os.getenv("CHAT_HISTORY_MAX_USERS", 10000))
+
+# Chat prompt size
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", 3500))  # Max prompt tokens, system prompt included
+CHAT_TOKENIZER = os.getenv("CHAT_TOKENIZER", "heuristic")  # "heuristic", "tiktoken:<encoding>" or "huggingface:<repo>"
+
+# Chat retrieval (article excerpts added to the prompt)
+CHAT_RAG_ENABLED = os.getenv("CHAT_RAG_ENABLED", "true").lower() == "true"
+CHAT_RAG_TOP_K = int(os.getenv("CHAT_RAG_TOP_K", 4))  # Most excerpts per question
+CHAT_RAG_TOKEN_BUDGET = int(os.getenv("CHAT_RAG_TOKEN_BUDGET", 800))  # Taken out of CHAT_TOKEN_BUDGET before history
+CHAT_RAG_CHUNK_TOKENS = int(os.getenv("CHAT_RAG_CHUNK_TOKENS", 200))  # Size of an excerpt
+CHAT_RAG_MIN_SCORE = float(os.getenv("CHAT_RAG_MIN_SCORE", 0.15))  # Cosine similarity below which excerpts are left out
+CHAT_RAG_DIMENSIONS = int(os.getenv("CHAT_RAG_DIMENSIONS", 2048))  # Hashed vector size; memory is chunks x this x 4 bytes
+
+# Chat response cache (first-turn questions only)
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 2000))
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", 86400))
+
+# LLM gateway
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))  # Calls to DeepSeek in flight per worker process
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 64))  # Calls allowed to wait for a slot before new ones get a 503
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))  # Max seconds a call waits for a slot
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))  # Per-call read timeout
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 0)) or None  # HTTP keep-alive connections (defaults to LLM_MAX_CONCURRENCY)
+
+# Supabase HTTP connection pool (shared by the database and auth clients)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", 20))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", 30))
+SERVICES_PRELOAD = os.getenv("SERVICES_PRELOAD", "true").lower() == "true"  # Create clients in the background at startup
+
+# Read cache for articles and practice questions
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", 300))  # Also bounds staleness across worker processes
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", 1000))
+
+# In-memory content index (article categories and practice questions)
+CONTENT_INDEX_PRELOAD = os.getenv("CONTENT_INDEX_PRELOAD", "true").lower() == "true"  # Build at startup
+CONTENT_INDEX_REFRESH = int(os.getenv("CONTENT_INDEX_REFRESH", 300))  # Seconds between full reads of articles/questions (all in-memory indexes)
+
+# Admin bulk import
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))  # Rows per upsert request
+
+# Per-user progress summaries
+PROGRESS_SUMMARY_TTL = int(os.getenv("PROGRESS_SUMMARY_TTL", 60))  # Seconds before counters are rebuilt from the table (marks made through other workers show up by then)
+PROGRESS_SUMMARY_SIZE = int(os.getenv("PROGRESS_SUMMARY_SIZE", 10000))
+
+# Request metrics (/metrics, Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Required: /metrics is only served to "Authorization: Bearer <token>"
+METRICS_DIR = os.getenv("METRICS_DIR")  # Shared by workers to sum their metrics (gunicorn.conf.py picks one for several workers)
+METRICS_SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL", 5))  # Seconds between a worker's snapshots
+
+# Serving (run.py for development, gunicorn.conf.py for production)
+FLASK_DEBUG = os.getenv("FLASK_DEBUG", "false").lower() == "true"  # Development server only; never in production
+WEB_BIND = os.getenv("WEB_BIND", f"0.0.0.0:{os.getenv('PORT', 8000)}")
+WEB_WORKER_CLASS = os.getenv("WEB_WORKER_CLASS", "gthread")  # "gthread", or "gevent" for many long-lived chat streams
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 0)) or (os.cpu_count() or 1) + 1  # 0 means CPU count + 1
+WEB_THREADS = int(os.getenv("WEB_THREADS", 32))  # gthread: requests in flight per worker (LLM calls hold one each)
+WEB_WORKER_CONNECTIONS = int(os.getenv("WEB_WORKER_CONNECTIONS", 1000))  # gevent: concurrent connections per worker
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", 120))  # Seconds before a silent worker is killed and restarted
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))  # Seconds to finish in-flight requests on shutdown
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", 5))
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", 2000))  # Recycle workers to cap memory growth (0 disables)
+WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 200))  # Spread recycling so workers do not restart together
+WEB_PRELOAD = os.getenv("WEB_PRELOAD", "true").lower() == "true"  # Load the app once in the master and fork workers from it
@@ -0,0 +1,115 @@
+# Production server settings. Run from the project root with:
+#
+#     gunicorn            (this file is picked up automatically)
+#
+# Every value can be changed through the WEB_* environment variables in config.py.
+# gthread (default) gives each worker WEB_THREADS threads, which suits a mix of short
+# Supabase calls and LLM calls that hold a thread for many seconds. gevent (pip install
+# gevent) serves thousands of idle chat streams per worker instead.
+import os
+import shutil
+import tempfile
+
+from config import (
+    WEB_BIND, WEB_WORKER_CLASS, WEB_WORKERS, WEB_THREADS, WEB_WORKER_CONNECTIONS,
+    WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT, WEB_KEEPALIVE, WEB_MAX_REQUESTS, WEB_MAX_REQUESTS_JITTER,
+    WEB_PRELOAD, CONTENT_INDEX_PRELOAD, SERVICES_PRELOAD,
+)
+
+import config as app_settings  # Not "config", which gunicorn would read as its own setting
+
+# Per-worker memory cannot hold chat history once requests are spread over several
+# workers; the app reads this when it is imported, after this file has run
+if WEB_WORKERS > 1 and app_settings.CHAT_HISTORY_BACKEND == "auto":
+    app_settings.CHAT_HISTORY_BACKEND = "sqlite"
+
+# Likewise for /metrics: workers sum their numbers through snapshot files in a shared directory
+if WEB_WORKERS > 1 and not app_settings.METRICS_DIR:
+    app_settings.METRICS_DIR = tempfile.mkdtemp(prefix="dsa-tutor-metrics-")
+    app_settings.METRICS_DIR_TEMPORARY = True  # Removed again in on_exit
+
+if WEB_WORKER_CLASS == "gevent":
+    # Must happen before the app (and ssl/httpx) is imported by preload_app
+    from gevent import monkey
+    monkey.patch_all()
+
+wsgi_app = "wsgi:app"
+bind = WEB_BIND
+worker_class = WEB_WORKER_CLASS
+workers = WEB_WORKERS
+threads = WEB_THREADS
+worker_connections = WEB_WORKER_CONNECTIONS
+
+timeout = WEB_TIMEOUT
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+keepalive = WEB_KEEPALIVE
+
+max_requests = WEB_MAX_REQUESTS
+max_requests_jitter = WEB_MAX_REQUESTS_JITTER
+
+# Import the app and client SDKs once in the master; workers are forked with them loaded
+preload_app = WEB_PRELOAD
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """Master, before anything else: drop metric snapshots left by a previous run"""
+    if app_settings.METRICS_DIR and os.path.isdir(app_settings.METRICS_DIR):
+        for name in os.listdir(app_settings.METRICS_DIR):
+            if name.endswith(".json"):
+                os.remove(os.path.join(app_settings.METRICS_DIR, name))
+
+
+def on_exit(server):
+    """Master, shutting down: remove the metrics directory picked above"""
+    if getattr(app_settings, "METRICS_DIR_TEMPORARY", False):
+        shutil.rmtree(app_settings.METRICS_DIR, ignore_errors=True)
+
+
+def when_ready(server):
+    """Master, after the app is loaded: import the client SDKs once so every worker inherits them"""
+    if workers > 1:
+        if app_settings.CHAT_HISTORY_BACKEND == "memory":
+            server.log.warning(
+                "CHAT_HISTORY_BACKEND=memory with %d workers: each worker keeps its own chat history, "
+                "so users lose context when their requests reach another worker. Use sqlite or auto.", workers
+            )
+        server.log.info(
+            "%d workers: promotions to admin reach other workers within ROLE_CACHE_TTL=%ss and progress "
+            "summaries within PROGRESS_SUMMARY_TTL=%ss", workers, app_settings.ROLE_CACHE_TTL,
+            app_settings.PROGRESS_SUMMARY_TTL,
+        )
+    if app_settings.METRICS_ENABLED and not app_settings.METRICS_TOKEN:
+        server.log.warning("METRICS_TOKEN is not set: /metrics answers 403 until it is")
+    if preload_app:
+        from app.services import services
+        services.warm(background=False)
+
+
+def post_fork(server, worker):
+    """Worker, right after fork: drop clients created in the master (their connection pools are not fork-safe)"""
+    from app.services import services
+    services.reset()
+
+
+def post_worker_init(worker):
+    """Worker, ready to serve: start the background warm-ups that create_app(preload=False) skipped"""
+    from app.content_index import content_loader
+    from app.services import services
+
+    if CONTENT_INDEX_PRELOAD:
+        content_loader.warm()
+    if SERVICES_PRELOAD:
+        services.warm()
+
+
+def worker_exit(server, worker):
+    """Worker, shutting down: flush buffered chat interactions and hand its metrics to the other workers"""
+    from app.writebehind import drain_all
+    drain_all(timeout=max(1, WEB_GRACEFUL_TIMEOUT // 2))
+
+    from app import metrics
+    if metrics.shared is not None:
+        metrics.shared.retire()
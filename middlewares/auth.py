@@ -1,39 +1,143 @@
 from functools import wraps
 from flask import request, jsonify
-from app import supabase  
+import jwt
+from app.services import get_supabase
+from app.cache import TTLCache
+from app.metrics import span
+from config import (
+    AUTH_MODE, SUPABASE_URL, SUPABASE_JWT_SECRET, SUPABASE_JWT_AUDIENCE,
+    ROLE_CACHE_TTL, ROLE_CACHE_SIZE,
+)
+
+# user_id -> role, so repeat requests skip the `users` table lookup. Only roles without
+# extra rights are cached: each worker has its own cache, and a demoted admin must lose
+# admin rights on every worker at once, not after ROLE_CACHE_TTL
+role_cache = TTLCache(maxsize=ROLE_CACHE_SIZE, ttl=ROLE_CACHE_TTL)
+CACHED_ROLES = ("user",)
+
+# Algorithms Supabase signs access tokens with (HS256 legacy secret, RS256/ES256 signing keys)
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+_jwks_client = None
+
+
+class LocalVerificationUnavailable(Exception):
+    """Raised when the key material needed to verify a token locally is not available"""
+
+
+def get_jwks_client():
+    """Lazily create the JWKS client for projects using asymmetric signing keys"""
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json", cache_keys=True)
+    return _jwks_client
+
+
+def verify_token_locally(token):
+    """Validate signature, expiry and audience of a Supabase JWT and return the user id"""
+    algorithm = jwt.get_unverified_header(token).get("alg")
+
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        try:
+            key = get_jwks_client().get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientConnectionError as e:
+            print("⚠️ Could not fetch the signing keys, asking Supabase:", str(e))
+            raise LocalVerificationUnavailable(str(e))
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+    return claims["sub"]
+
+
+def verify_token_remotely(token):
+    """Ask Supabase Auth who the token belongs to (one network round-trip)"""
+    response = get_supabase().auth.get_user(token)
+    if not response or not hasattr(response, "user") or not response.user:
+        return None
+    return response.user.id
+
+
+def get_user_role(user_id):
+    """Return the user's role from the cache, falling back to the `users` table"""
+    role = role_cache.get(user_id)
+    if role is not None:
+        return role
+
+    user_data = get_supabase().table("users").select("role").eq("id", user_id).execute()
+    if not user_data.data:
+        return None
+
+    role = user_data.data[0]["role"]
+    if role in CACHED_ROLES:
+        role_cache.set(user_id, role)
+    return role
+
+
+def invalidate_user_role(user_id):
+    """Drop a cached role, e.g. after an admin changes it"""
+    role_cache.pop(user_id)
+
+
+def get_bearer_token():
+    token = request.headers.get("Authorization")
+    # Remove 'Bearer ' prefix if present
+    return token.replace("Bearer ", "") if token else None
+
+
+def check_auth_config():
+    """Warn once at startup when AUTH_MODE=local cannot verify HS256 tokens locally"""
+    if AUTH_MODE == "local" and not SUPABASE_JWT_SECRET:
+        print("⚠️ SUPABASE_JWT_SECRET is not set: HS256 tokens are verified by Supabase on every request")
+
+
+def local_user_id(token):
+    """User id from local verification, or None when the remote check must be used"""
+    if AUTH_MODE != "local":
+        return None
+    try:
+        return verify_token_locally(token)
+    except LocalVerificationUnavailable:
+        return None  # Reported once by check_auth_config (missing secret) or by verify_token_locally
+
 
 def token_required(f):
     """Middleware to check authentication token"""
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get("Authorization")
+        token = get_bearer_token()
 
         if not token:
             return jsonify({"error": "Token is missing!"}), 403
 
-        # Remove 'Bearer ' prefix if present
-        token = token.replace("Bearer ", "")
-
         try:
-            # ✅ Decode token and get user info
-            response = supabase.auth.get_user(token)
+            with span("auth", "verify"):
+                user_id = local_user_id(token)
+                if user_id is None:
+                    user_id = verify_token_remotely(token)
 
-            # ✅ Fix: Access `user` property correctly
-            if not response or not hasattr(response, "user") or not response.user:
+            if not user_id:
                 return jsonify({"error": "Invalid token"}), 403
 
-            user_id = response.user.id  # ✅ Extract the UUID from the token
-
-            # ✅ Fix: Ensure the user exists in `users` table
-            user_data = supabase.table("users").select("role").eq("id", user_id).execute()
-
-            # ✅ Fix: Properly check if user exists
-            if not user_data.data or len(user_data.data) == 0:
+            with span("auth", "role"):
+                role = get_user_role(user_id)
+            if role is None:
                 return jsonify({"error": "User not found in database!"}), 404
 
             user = {
                 "id": user_id,
-                "role": user_data.data[0]["role"]
+                "role": role
             }
 
             return f(user, *args, **kwargs)
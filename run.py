@@ -1,8 +1,9 @@
 from app import create_app
+from config import FLASK_DEBUG
 
 # Create the Flask app
 app = create_app()
 
 if __name__ == "__main__":
-    # Run the Flask development server
-    app.run(debug=True)
+    # Run the Flask development server (use gunicorn in production, see gunicorn.conf.py)
+    app.run(debug=FLASK_DEBUG)
@@ -0,0 +1,5 @@
+from app import create_app
+
+# Entry point for gunicorn (see gunicorn.conf.py). Background warm-ups are started in
+# each worker after fork rather than in the master that imports this module.
+app = create_app(preload=False)